@@ -0,0 +1,105 @@
+"""
+Baked asset pack: one versioned binary file holding raw pixel buffers (base
+board, token sprites, dice faces) plus pre-encoded media blobs.
+
+Layout (little-endian):
+    header   b"LUDOPACK" | u32 version | u32 entry count
+    entries  u16 name length | name | 8s mode | u32 width | u32 height | u64 offset | u64 length
+    data     each buffer starts on a 64-byte boundary
+
+At runtime the file is memory-mapped and images are wrapped with
+Image.frombuffer, so pixels are never copied and every worker process shares
+the same physical pages. Image entries must use a mode Pillow can map
+directly (RGBX, RGBA, L); entries with mode "BLOB" are returned as memoryviews.
+
+Bump ASSET_PACK_VERSION whenever anything baked into the pack changes.
+"""
+import mmap
+import os
+import struct
+from PIL import Image
+
+ASSET_PACK_VERSION = 1
+ASSET_PACK_PATH = os.getenv("ASSET_PACK", os.path.join(os.path.dirname(os.path.abspath(__file__)), "assets.pack"))
+
+MAGIC = b"LUDOPACK"
+HEADER = struct.Struct("<8sII")
+ENTRY = struct.Struct("<8sIIQQ")
+ALIGN = 64
+BLOB = "BLOB"
+
+def write_pack(path, entries):
+    """Writes `entries` (name -> PIL Image or bytes) to `path` atomically."""
+    index = []
+    payloads = []
+    for name, value in entries.items():
+        if isinstance(value, Image.Image):
+            index.append((name, value.mode, value.size[0], value.size[1]))
+            payloads.append(value.tobytes())
+        else:
+            index.append((name, BLOB, 0, 0))
+            payloads.append(bytes(value))
+
+    header_size = HEADER.size + sum(2 + len(name.encode()) + ENTRY.size for name, *_ in index)
+    offset = -(-header_size // ALIGN) * ALIGN
+    table = bytearray(HEADER.pack(MAGIC, ASSET_PACK_VERSION, len(index)))
+    offsets = []
+    for (name, mode, w, h), data in zip(index, payloads):
+        encoded = name.encode()
+        table += struct.pack("<H", len(encoded)) + encoded
+        table += ENTRY.pack(mode.encode(), w, h, offset, len(data))
+        offsets.append(offset)
+        offset = -(-(offset + len(data)) // ALIGN) * ALIGN
+
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(table)
+        for start, data in zip(offsets, payloads):
+            f.seek(start)
+            f.write(data)
+    os.replace(tmp_path, path)
+
+def load_pack(path=ASSET_PACK_PATH):
+    """
+    Maps the pack at `path` and returns name -> Image (or memoryview for blobs).
+    Returns {} if the pack is missing, unreadable or built for another version.
+    """
+    if not path or not os.path.exists(path):
+        return {}
+    try:
+        with open(path, "rb") as f:
+            mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, count = HEADER.unpack_from(mm, 0)
+        if magic != MAGIC or version != ASSET_PACK_VERSION:
+            print(f"Asset pack {path} is stale (version {version}), rebuilding assets in memory.")
+            return {}
+
+        view = memoryview(mm)
+        entries = {}
+        pos = HEADER.size
+        for _ in range(count):
+            (name_len,) = struct.unpack_from("<H", mm, pos)
+            pos += 2
+            name = bytes(mm[pos:pos + name_len]).decode()
+            pos += name_len
+            mode, w, h, offset, length = ENTRY.unpack_from(mm, pos)
+            pos += ENTRY.size
+            mode = mode.rstrip(b"\0").decode()
+            data = view[offset:offset + length]
+            if mode == BLOB:
+                entries[name] = data
+            else:
+                entries[name] = Image.frombuffer(mode, (w, h), data, "raw", mode, 0, 1)
+        return entries
+    except Exception as e:
+        print(f"Asset pack {path} could not be loaded: {e}")
+        return {}
+
+_pack = None
+
+def asset_pack():
+    """The process-wide asset pack, mapped on first use."""
+    global _pack
+    if _pack is None:
+        _pack = load_pack()
+    return _pack
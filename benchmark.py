@@ -0,0 +1,241 @@
+"""
+Benchmark and regression suite for the render pipeline.
+
+Every case runs on seeded random but valid game states (2-4 players, team
+mode, stacked tokens, tokens in home stretches) and reports latency
+percentiles, the tracemalloc peak of one pass over the inputs and the mean
+output size. tracemalloc only sees Python-level allocations, so Pillow's
+pixel buffers are not part of the peak.
+
+Usage:
+    python benchmark.py [--iterations 200] [--seed 1] [--json results.json] [--compare baseline.json]
+
+Write one JSON file per commit and pass an older one to --compare to get the
+relative change for every case.
+"""
+import argparse
+import copy
+import json
+import os
+import platform
+import random
+import subprocess
+import time
+import tracemalloc
+
+# ludo.render pulls COLORS from config, which insists on the bot credentials
+for var in ("API_ID", "API_HASH", "BOT_TOKEN", "DATABASE_URL"):
+    os.environ.setdefault(var, "1")
+
+import PIL
+import board_renderer
+import dice_renderer
+from ludo import render as emoji_render
+from ludo.state import GameState, Player, Token
+from team_logic import get_team_id
+
+def random_position(rng):
+    """A legal DB position: base, main path, home stretch or finished."""
+    kind = rng.random()
+    if kind < 0.3: return -1
+    if kind < 0.75: return rng.randint(0, 51)
+    if kind < 0.9: return rng.randint(52, 57)
+    return 99
+
+def random_game_state(rng, num_players=None, team_mode=None):
+    """
+    Builds a DB-shaped game dict. Roughly one token in five is stacked on a
+    main-path square already used by its own colour or an opponent.
+    """
+    num_players = num_players or rng.randint(2, 4)
+    if team_mode is None:
+        team_mode = num_players == 4 and rng.random() < 0.5
+    occupied = []
+    players = []
+    for color in range(num_players):
+        tokens = []
+        for t_idx in range(4):
+            if occupied and rng.random() < 0.2:
+                position = rng.choice(occupied)
+            else:
+                position = random_position(rng)
+            if 0 <= position <= 51:
+                occupied.append(position)
+            tokens.append({'id': color * 4 + t_idx, 'token_index': t_idx, 'position': position, 'is_finished': position == 99})
+        players.append({
+            'user_id': 1000 + color,
+            'username': f"player{color}",
+            'color': color,
+            'team_id': get_team_id(color) if team_mode else None,
+            'tokens': tokens,
+        })
+    return {
+        'status': 'PLAYING',
+        'team_mode': team_mode,
+        'players': players,
+        'current_turn_index': rng.randrange(num_players),
+        'dice_value': rng.choice([0, rng.randint(1, 6)]),
+    }
+
+def random_ludo_state(rng):
+    """Builds a ludo.state.GameState with tokens at home, on the track, in the home path or finished."""
+    players = []
+    for color in range(rng.randint(2, 4)):
+        tokens = []
+        for _ in range(4):
+            kind = rng.random()
+            if kind < 0.3: tokens.append(Token())
+            elif kind < 0.9: tokens.append(Token(pos=rng.randint(0, 55), state="active"))
+            else: tokens.append(Token(pos=56, state="finished"))
+        players.append(Player(user_id=1000 + color, first_name=f"Player {color}", color_index=color, tokens=tokens))
+    return GameState(chat_id=1, players=players, is_lobby=False)
+
+def move_sequence(rng, length, chat_id=1):
+    """Consecutive states of one chat where a single token moves per step."""
+    state = random_game_state(rng, num_players=4)
+    state['chat_id'] = chat_id
+    states = [state]
+    for _ in range(length - 1):
+        state = copy.deepcopy(state)
+        player = rng.choice(state['players'])
+        rng.choice(player['tokens'])['position'] = rng.randint(0, 51)
+        state['current_turn_index'] = (state['current_turn_index'] + 1) % len(state['players'])
+        states.append(state)
+    return states
+
+def render_uncached(state):
+    """render_board with the encoded-image cache bypassed, so compose + encode is measured."""
+    board_renderer.IMAGE_CACHE.clear()
+    return board_renderer.render_board(state)
+
+def percentile(sorted_values, pct):
+    """Nearest-rank percentile of an already sorted list."""
+    rank = max(1, -(-len(sorted_values) * pct // 100))
+    return sorted_values[rank - 1]
+
+def bench(fn, inputs, iterations, size=None):
+    """Times `fn` over `inputs` (cycled) and returns the result row for one case."""
+    for item in inputs[:3]:
+        fn(item)  # Warm up
+    timings = []
+    sizes = []
+    for i in range(iterations):
+        item = inputs[i % len(inputs)]
+        start = time.perf_counter()
+        out = fn(item)
+        timings.append((time.perf_counter() - start) * 1000)
+        if size: sizes.append(size(out))
+
+    # Separate pass: tracing slows every allocation down, so it must not skew the timings
+    tracemalloc.start()
+    for item in inputs[:20]:
+        fn(item)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    timings.sort()
+    return {
+        "iterations": iterations,
+        "mean_ms": sum(timings) / len(timings),
+        "p50_ms": percentile(timings, 50),
+        "p90_ms": percentile(timings, 90),
+        "p99_ms": percentile(timings, 99),
+        "max_ms": timings[-1],
+        "peak_kb": peak / 1024,
+        "bytes_mean": sum(sizes) / len(sizes) if sizes else None,
+    }
+
+def buffer_size(buf):
+    return len(buf.getvalue())
+
+def run_suite(iterations, seed):
+    rng = random.Random(seed)
+    states = [random_game_state(rng) for _ in range(50)]
+    ludo_states = [random_ludo_state(rng) for _ in range(50)]
+    sequence = move_sequence(rng, iterations + 3)
+    frames = [board_renderer.compose_board(state).copy() for state in states]
+
+    results = {}
+    results["board_renderer.render_board"] = bench(render_uncached, states, iterations, buffer_size)
+    results["board_renderer.render_board (per chat)"] = bench(render_uncached, sequence, iterations, buffer_size)
+    for state in states:
+        board_renderer.render_board(state)  # Prime the image cache
+    results["board_renderer.render_board (cache hit)"] = bench(board_renderer.render_board, states, iterations, buffer_size)
+    # Encode cost vs upload size for each output profile, on the same composed frames
+    for profile in board_renderer.RENDER_PROFILES:
+        results[f"board_renderer.encode_frame ({profile})"] = bench(
+            lambda frame, profile=profile: board_renderer.encode_frame(frame, profile), frames, iterations, len
+        )
+    results["ludo.render.render_board"] = bench(
+        emoji_render.render_board, ludo_states, iterations, lambda text: len(text.encode())
+    )
+    # ludo.state codecs: the dict path as stored (JSON text) against the binary one
+    state_json = [json.dumps(state.to_dict()) for state in ludo_states]
+    state_blobs = [state.to_bytes() for state in ludo_states]
+    results["ludo.state.to_dict + json"] = bench(lambda state: json.dumps(state.to_dict()), ludo_states, iterations, len)
+    results["ludo.state.from_dict + json"] = bench(lambda text: GameState.from_dict(json.loads(text)), state_json, iterations)
+    results["ludo.state.to_bytes"] = bench(GameState.to_bytes, ludo_states, iterations, len)
+    results["ludo.state.from_bytes"] = bench(GameState.from_bytes, state_blobs, iterations)
+    results["dice_renderer.generate_dice_frame"] = bench(
+        dice_renderer.generate_dice_frame, list(range(1, 7)), iterations, buffer_size
+    )
+    return results
+
+def git_commit():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], stderr=subprocess.DEVNULL).decode().strip()
+    except Exception:
+        return None
+
+def print_results(results, baseline=None):
+    print(f"{'case':<44} {'mean':>8} {'p50':>8} {'p90':>8} {'p99':>8} {'peak KB':>9} {'size KB':>9}")
+    for name, row in results.items():
+        size = f"{row['bytes_mean'] / 1024:9.2f}" if row['bytes_mean'] is not None else f"{'-':>9}"
+        print(
+            f"{name:<44} {row['mean_ms']:8.3f} {row['p50_ms']:8.3f} {row['p90_ms']:8.3f} "
+            f"{row['p99_ms']:8.3f} {row['peak_kb']:9.1f} {size}"
+        )
+        old = (baseline or {}).get(name)
+        if old:
+            def delta(key, width):
+                if not old.get(key) or row[key] is None: return f"{'-':>{width}}"
+                return f"{(row[key] - old[key]) / old[key] * 100:+{width - 1}.1f}%"
+            print(
+                f"{'  vs baseline':<44} {delta('mean_ms', 8)} {delta('p50_ms', 8)} {delta('p90_ms', 8)} "
+                f"{delta('p99_ms', 8)} {delta('peak_kb', 9)} {delta('bytes_mean', 9)}"
+            )
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the board, emoji and dice renderers.")
+    parser.add_argument("--iterations", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--json", help="write machine-readable results to this file")
+    parser.add_argument("--compare", help="baseline JSON from an earlier run to diff against")
+    args = parser.parse_args()
+
+    results = run_suite(args.iterations, args.seed)
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)["results"]
+    print_results(results, baseline)
+    print(f"\nimage cache: {board_renderer.IMAGE_CACHE.stats()}")
+
+    if args.json:
+        report = {
+            "meta": {
+                "commit": git_commit(),
+                "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+                "python": platform.python_version(),
+                "pillow": PIL.__version__,
+                "seed": args.seed,
+                "iterations": args.iterations,
+            },
+            "results": results,
+        }
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"Results written to {args.json}")
+
+if __name__ == "__main__":
+    main()
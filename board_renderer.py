@@ -1,6 +1,11 @@
 from PIL import Image, ImageDraw, ImageFont, ImageFilter
 import io
-from coordinate_system import get_token_pixel_position, SAFE_ZONE_INDICES, UNIT_SIZE, MAIN_PATH_COORDS, HOME_BASE_COORDS
+from collections import Counter, OrderedDict
+from cache import LRUCache, ByteLRUCache
+from assets import asset_pack
+from game_logic import game_positions
+from rules_core import FINISHED, build_occupancy, color_tokens
+from coordinate_system import TOKEN_PIXELS, POSITION_SPAN, STACK_OFFSETS, SAFE_ZONE_INDICES, UNIT_SIZE, MAIN_PATH_COORDS, HOME_BASE_COORDS
 
 def draw_star(draw, x, y, size, fill):
     """Draws a star shape."""
@@ -96,101 +101,327 @@ def generate_base_board():
 import os
 
 def load_base_board():
-    """Loads a custom board image if exists, otherwise generates one."""
+    """
+    Loads a custom board image if exists, otherwise generates one.
+    Returns (image, theme) where theme names the board source for cache keys.
+    """
     if os.path.exists("playing_board.png"):
         try:
             img = Image.open("playing_board.png").convert('RGB')
             # Ensure it's 1000x1000 to match coordinate system
             if img.size != (1000, 1000):
                 img = img.resize((1000, 1000), Image.LANCZOS)
-            return img
+            return img, "custom"
         except:
             pass
-    return generate_base_board()
+    return generate_base_board(), "classic"
 
-BASE_BOARD_IMG = load_base_board()
+def packed_base_board(pack):
+    """Base board from the asset pack as (image, theme), or None if not baked."""
+    for name, img in pack.items():
+        if name.startswith("board/"):
+            return img, name.split("/", 1)[1]
+    return None
 
-def draw_glow(draw, x, y, color):
-    # Simplified glow: 3 ellipses instead of 6
-    for i in range(15, 36, 10):
+# Memory-mapped from the asset pack when present (see build_assets.py); the
+# pack stores RGBX so Pillow can wrap the mapping without copying.
+ASSETS = asset_pack()
+BASE_BOARD_IMG, BOARD_THEME = packed_base_board(ASSETS) or load_base_board()
+
+PLAYER_COLORS = {
+    0: (231, 76, 60, 255),  # Red
+    1: (46, 204, 113, 255), # Green
+    2: (241, 196, 15, 255), # Yellow
+    3: (52, 152, 219, 255)  # Blue
+}
+
+# Sprite geometry: every sprite is a square RGBA tile whose centre sits on the
+# token's pixel position, so pasting only touches that small bounding box.
+TOKEN_SPRITE_HALF = 27
+GLOW_SPRITE_HALF = 36
+
+def _layer(size, box, fill):
+    layer = Image.new('RGBA', (size, size), (0, 0, 0, 0))
+    ImageDraw.Draw(layer).ellipse(box, fill=fill)
+    return layer
+
+def build_token_sprite(color):
+    """Pre-renders one token (shadow, border, disc, gloss) as an RGBA tile."""
+    h = TOKEN_SPRITE_HALF
+    size = 2 * h
+    sprite = Image.new('RGBA', (size, size), (0, 0, 0, 0))
+    for box, fill in (
+        ([h-22, h-18, h+22, h+26], (0, 0, 0, 40)),        # Shadow
+        ([h-24, h-24, h+24, h+24], (255, 255, 255, 255)), # Border
+        ([h-22, h-22, h+22, h+22], color),                # Token
+        ([h-10, h-10, h+5, h+5], (255, 255, 255, 80)),    # Inner gloss
+    ):
+        sprite = Image.alpha_composite(sprite, _layer(size, box, fill))
+    return sprite
+
+def build_glow_sprite(color):
+    """Pre-renders the current-player highlight: 3 ellipses, largest first."""
+    h = GLOW_SPRITE_HALF
+    size = 2 * h
+    sprite = Image.new('RGBA', (size, size), (0, 0, 0, 0))
+    for i in range(35, 14, -10):
         alpha = int(80 * (1 - i/40))
-        glow_color = (*color[:3], alpha)
-        draw.ellipse([x-i, y-i, x+i, y+i], fill=glow_color)
-
-def render_board(game_state):
-    # Performance: Only check board file logic if not already loaded once
-    global BASE_BOARD_IMG
-    if not hasattr(render_board, "bg_loaded") or not render_board.bg_loaded:
-        if os.path.exists("playing_board.png"):
-            BASE_BOARD_IMG = load_base_board()
-        render_board.bg_loaded = True
-
-    img = BASE_BOARD_IMG.copy()
-    overlay = Image.new('RGBA', img.size, (255, 255, 255, 0))
-    draw = ImageDraw.Draw(overlay)
-    
-    player_colors = {
-        0: (231, 76, 60, 255),  # Red
-        1: (46, 204, 113, 255), # Green
-        2: (241, 196, 15, 255), # Yellow
-        3: (52, 152, 219, 255)  # Blue
-    }
-    
-    occupations = {}
-    for p_idx, player in enumerate(game_state['players']):
-        for t_idx, token in enumerate(player['tokens']):
-            if token['position'] == 99: continue
-            pos_key = (player['color'], token['position'])
-            if pos_key not in occupations: occupations[pos_key] = []
-            occupations[pos_key].append((p_idx, t_idx))
+        sprite = Image.alpha_composite(sprite, _layer(size, [h-i, h-i, h+i, h+i], (*color[:3], alpha)))
+    return sprite
+
+def build_stack_sprite(token_sprite, count):
+    """Pre-composites `count` overlapping tokens into one tile centred on the square."""
+    offsets = STACK_OFFSETS[count]
+    h = TOKEN_SPRITE_HALF + max(offsets)
+    sprite = Image.new('RGBA', (2 * h, 2 * h), (0, 0, 0, 0))
+    for off in offsets:
+        corner = h + off - TOKEN_SPRITE_HALF
+        sprite.alpha_composite(token_sprite, (corner, corner))
+    return sprite
+
+def packed_sprite(name, build, *args):
+    img = ASSETS.get(name)
+    return img if img is not None else build(*args)
+
+TOKEN_SPRITES = {c: packed_sprite(f"token/{c}", build_token_sprite, rgba) for c, rgba in PLAYER_COLORS.items()}
+GLOW_SPRITES = {c: packed_sprite(f"glow/{c}", build_glow_sprite, rgba) for c, rgba in PLAYER_COLORS.items()}
+# STACK_SPRITES[color][count] for 2-4 tokens of one colour on a single square
+STACK_SPRITES = {
+    c: {n: packed_sprite(f"stack/{c}/{n}", build_stack_sprite, sprite, n) for n in range(2, 5)}
+    for c, sprite in TOKEN_SPRITES.items()
+}
+
+def baked_assets():
+    """Everything board_renderer bakes into the asset pack, by entry name."""
+    entries = {f"board/{BOARD_THEME}": BASE_BOARD_IMG.convert('RGBX')}
+    for c in PLAYER_COLORS:
+        entries[f"token/{c}"] = TOKEN_SPRITES[c]
+        entries[f"glow/{c}"] = GLOW_SPRITES[c]
+        for n, sprite in STACK_SPRITES[c].items():
+            entries[f"stack/{c}/{n}"] = sprite
+    return entries
+
+# Flat lookup used by the layer list: ('token', c), ('glow', c), ('stack', c, n)
+SPRITES = {}
+for c in PLAYER_COLORS:
+    SPRITES[('token', c)] = TOKEN_SPRITES[c]
+    SPRITES[('glow', c)] = GLOW_SPRITES[c]
+    for n, sprite in STACK_SPRITES[c].items():
+        SPRITES[('stack', c, n)] = sprite
+
+BANNER_BOX = (10, 10, 400, 60)
+BANNER_TEXT_XY = (20, 15)
+
+# Output profiles: the composed 1000x1000 frame is box-downscaled by the integer
+# `reduce` factor (1000 / 500 / 334 px; Image.reduce is several times cheaper
+# than a fractional resize) and encoded with `format` + `options`. Deployment
+# default via RENDER_PROFILE, per-chat override via /quality.
+RENDER_PROFILES = {
+    "full":   {"reduce": 1, "format": "JPEG", "options": {"quality": 85}},
+    "medium": {"reduce": 2, "format": "JPEG", "options": {"quality": 85, "optimize": True}},
+    "small":  {"reduce": 3, "format": "JPEG", "options": {"quality": 75, "optimize": True}},
+    "webp":   {"reduce": 2, "format": "WEBP", "options": {"quality": 80, "method": 0}},
+}
+DEFAULT_PROFILE = os.getenv("RENDER_PROFILE", "full")
+if DEFAULT_PROFILE not in RENDER_PROFILES: DEFAULT_PROFILE = "full"
+
+# Encoded image bytes keyed by board_key(); hit/miss/eviction counters via IMAGE_CACHE.stats()
+IMAGE_CACHE = ByteLRUCache(int(os.getenv("RENDER_CACHE_BYTES", 16 * 1024 * 1024)))
+
+# Pre-rendered turn banners keyed by (text, theme)
+BANNER_CACHE = LRUCache(256)
+
+# Last composed frame per chat: chat_id -> (image, layers, banner text)
+FRAME_CACHE_SIZE = 32  # ~3 MB per 1000x1000 RGB frame
+_frames = OrderedDict()
+
+def paste_sprite(img, sprite, x, y):
+    """Alpha-blends a centred sprite into its bounding box only."""
+    half = sprite.size[0] // 2
+    img.paste(sprite, (int(x) - half, int(y) - half), sprite)
+
+def load_banner_font():
+    try: return ImageFont.truetype("arial.ttf", 35)
+    except: return ImageFont.load_default()
+
+# Loaded once: the truetype probe hits the filesystem on every failed attempt
+BANNER_FONT = load_banner_font()
+
+def banner_strip(banner):
+    """
+    Returns (strip, (x, y)): the turn banner pre-rendered as an RGBA strip and
+    its top-left corner on the board. Cached per (text, theme) in BANNER_CACHE.
+    """
+    key = (banner, BOARD_THEME)
+    entry = BANNER_CACHE.get(key)
+    if entry is None:
+        left, top, right, bottom = BANNER_FONT.getbbox(banner)
+        tx, ty = BANNER_TEXT_XY
+        x0, y0, x1, y1 = BANNER_BOX
+        # Long usernames run past the white box, so the strip covers both
+        sx, sy = min(x0, tx + left), min(y0, ty + top)
+        width = max(x1, tx + right) + 1 - sx
+        height = max(y1, ty + bottom) + 1 - sy
+        strip = Image.new('RGBA', (width, height), (0, 0, 0, 0))
+        draw = ImageDraw.Draw(strip)
+        draw.rectangle([x0 - sx, y0 - sy, x1 - sx, y1 - sy], fill=(255, 255, 255, 255))
+        draw.text((tx - sx, ty - sy), banner, fill=(0, 0, 0), font=BANNER_FONT)
+        entry = (strip, (sx, sy))
+        BANNER_CACHE.put(key, entry)
+    return entry
+
+def board_layers(game_state):
+    """
+    Flattens a game state into its draw list.
+    Returns (layers, banner): layers is a tuple of (sprite_key, x, y) in paint
+    order, banner is the turn text or None. Two states with equal layers and
+    banner produce identical frames.
+    """
+    occupancy = build_occupancy(game_positions(game_state))
 
+    layers = []
+    banner = None
     # Glow for current player's tokens
     curr_turn = game_state.get('current_turn_index', 0)
     if curr_turn < len(game_state['players']):
         curr_player = game_state['players'][curr_turn]
-        glow_c = player_colors[curr_player['color']]
+        banner = f"Turn: @{curr_player['username']}"
+        glow = ('glow', curr_player['color'])
+        base = curr_player['color'] * POSITION_SPAN + 1
         for t in curr_player['tokens']:
             if -1 <= t['position'] < 99:
-                px, py = get_token_pixel_position(curr_player['color'], t['position'], t['token_index'])
-                draw_glow(draw, px, py, glow_c)
-
-    # Tokens
-    for pos_key, occupants in occupations.items():
-        color, pos = pos_key
-        count = len(occupants)
-        
-        for i, (p_idx, t_idx) in enumerate(occupants):
-            p_color = game_state['players'][p_idx]['color']
-            base_px, base_py = get_token_pixel_position(p_color, pos, t_idx)
-            
-            px, py = base_px, base_py
-            if pos != -1 and count > 1:
-                off_x = (i - (count-1)/2) * 15
-                off_y = (i - (count-1)/2) * 15
-                px, py = px + off_x, py + off_y
-            
-            # Simplified shadow (one ellipse)
-            draw.ellipse([px-22, py-18, px+22, py+26], fill=(0, 0, 0, 40))
-            # Border
-            draw.ellipse([px-24, py-24, px+24, py+24], fill=(255, 255, 255))
-            # Token
-            draw.ellipse([px-22, py-22, px+22, py+22], fill=player_colors[p_color])
-            # Inner gloss (Simplified)
-            draw.ellipse([px-10, py-10, px+5, py+5], fill=(255, 255, 255, 80))
-
-    img.paste(overlay, (0, 0), overlay)
-    draw_final = ImageDraw.Draw(img)
-    try: font = ImageFont.truetype("arial.ttf", 35)
-    except: font = ImageFont.load_default()
-    
-    if curr_turn < len(game_state['players']):
-        curr_p = game_state['players'][curr_turn]
-        draw_final.rectangle([10, 10, 400, 60], fill=(255, 255, 255, 200))
-        draw_final.text((20, 15), f"Turn: @{curr_p['username']}", fill=(0, 0, 0), font=font)
-    
+                px, py = TOKEN_PIXELS[(base + t['position']) * 4 + t['token_index']]
+                layers.append((glow, px, py))
+
+    # Tokens: one sprite per token in base, one pre-composited stack per shared
+    # square, drawn at its lowest token
+    for player in game_state['players']:
+        color = player['color']
+        for t_idx, token in enumerate(player['tokens']):
+            pos = token['position']
+            if pos == FINISHED: continue
+            px, py = TOKEN_PIXELS[(color * POSITION_SPAN + pos + 1) * 4 + t_idx]
+            stacked = color_tokens(occupancy, color, pos)
+            if pos == -1 or stacked == 1 << t_idx:
+                layers.append((('token', color), px, py))
+            elif stacked & -stacked == 1 << t_idx:
+                layers.append((('stack', color, min(bin(stacked).count("1"), 4)), px, py))
+
+    return tuple(layers), banner
+
+def layer_box(layer):
+    key, x, y = layer
+    half = SPRITES[key].size[0] // 2
+    return (x - half, y - half, x + half, y + half)
+
+def banner_box(banner):
+    strip, (x, y) = banner_strip(banner)
+    return (x, y, x + strip.size[0], y + strip.size[1])
+
+def draw_banner(img, banner, origin=(0, 0)):
+    """Pastes the cached banner strip; `origin` shifts it when drawing into a tile."""
+    strip, (x, y) = banner_strip(banner)
+    img.paste(strip, (x - origin[0], y - origin[1]), strip)
+
+def _overlaps(a, b):
+    return a[0] < b[2] and b[0] < a[2] and a[1] < b[3] and b[1] < a[3]
+
+def repaint_region(img, box, boxed_layers, banner, banner_area):
+    """Restores `box` from the base board and repaints every layer that touches it."""
+    x0, y0 = max(box[0], 0), max(box[1], 0)
+    x1, y1 = min(box[2], img.size[0]), min(box[3], img.size[1])
+    if x0 >= x1 or y0 >= y1: return
+    box = (x0, y0, x1, y1)
+    tile = BASE_BOARD_IMG.crop(box)
+    for (key, x, y), l_box in boxed_layers:
+        if _overlaps(l_box, box):
+            paste_sprite(tile, SPRITES[key], x - x0, y - y0)
+    if banner and _overlaps(banner_area, box):
+        draw_banner(tile, banner, origin=(x0, y0))
+    img.paste(tile, box)
+
+def compose_board(game_state):
+    """
+    Composes the board frame for a game state.
+    When the state carries a chat_id, the previous frame for that chat is
+    reused and only the regions whose layers changed are repainted.
+    """
+    layers, banner = board_layers(game_state)
+    chat_id = game_state.get('chat_id')
+    cached = _frames.pop(chat_id, None) if chat_id is not None else None
+
+    if cached is None:
+        img = BASE_BOARD_IMG.convert('RGB')
+        for key, x, y in layers:
+            paste_sprite(img, SPRITES[key], x, y)
+        if banner:
+            draw_banner(img, banner)
+    else:
+        img, old_layers, old_banner = cached
+        old_counts, new_counts = Counter(old_layers), Counter(layers)
+        dirty = [layer_box(l) for l in old_counts.keys() | new_counts.keys() if old_counts[l] != new_counts[l]]
+        banner_area = banner_box(banner) if banner else None
+        if banner != old_banner:
+            # One region covering both texts so the strip is redrawn only once
+            boxes = [banner_box(old_banner) if old_banner else None, banner_area]
+            boxes = [b for b in boxes if b]
+            dirty.append((min(b[0] for b in boxes), min(b[1] for b in boxes),
+                          max(b[2] for b in boxes), max(b[3] for b in boxes)))
+        boxed_layers = [(l, layer_box(l)) for l in layers]
+        for box in dirty:
+            repaint_region(img, box, boxed_layers, banner, banner_area)
+
+    if chat_id is not None:
+        _frames[chat_id] = (img, layers, banner)
+        while len(_frames) > FRAME_CACHE_SIZE:
+            _frames.popitem(last=False)
+    return img
+
+def resolve_profile(profile):
+    return profile if profile in RENDER_PROFILES else DEFAULT_PROFILE
+
+def board_key(game_state, profile=None):
+    """
+    Canonical key for everything that affects the rendered image:
+    theme, output profile, turn, banner username and each player's colour +
+    token positions. Positions are packed one byte per token (-1 -> 0, 99 -> 100).
+    """
+    players = game_state['players']
+    curr_turn = game_state.get('current_turn_index', 0)
+    username = players[curr_turn]['username'] if curr_turn < len(players) else None
+    packed = bytearray()
+    for player in players:
+        packed.append(player['color'])
+        packed.extend(t['position'] + 1 for t in player['tokens'])
+    return (BOARD_THEME, resolve_profile(profile), curr_turn, username, bytes(packed))
+
+def forget_chat(chat_id):
+    """Drops the cached frame for a chat (game closed or stopped)."""
+    _frames.pop(chat_id, None)
+
+def encode_frame(img, profile=None):
+    """Downscales (if needed) and encodes a composed frame with a render profile."""
+    opts = RENDER_PROFILES[resolve_profile(profile)]
+    if opts['reduce'] > 1:
+        img = img.reduce(opts['reduce'])
     buf = io.BytesIO()
-    # Optimized: Save as JPEG with 85% quality instead of PNG
-    # This significantly reduces file size (e.g. 200KB -> 40KB) and improves speed
-    img.save(buf, format='JPEG', quality=85)
-    buf.seek(0)
+    img.save(buf, format=opts['format'], **opts['options'])
+    return buf.getvalue()
+
+def encode_board(game_state, profile=None):
+    """Composes and encodes a board, bypassing IMAGE_CACHE. Returns the bytes."""
+    return encode_frame(compose_board(game_state), profile)
+
+def board_buffer(data, profile=None):
+    """Wraps encoded bytes in a named buffer so Telegram uploads get the right type."""
+    buf = io.BytesIO(data)
+    buf.name = f"board.{RENDER_PROFILES[resolve_profile(profile)]['format'].lower()}"
     return buf
+
+def render_board(game_state, profile=None):
+    key = board_key(game_state, profile)
+    data = IMAGE_CACHE.get(key)
+    if data is None:
+        data = encode_board(game_state, profile)
+        IMAGE_CACHE.put(key, data)
+    return board_buffer(data, profile)
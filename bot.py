@@ -1,8 +1,8 @@
 from pyrogram import Client, filters, enums
 from config import API_ID, API_HASH, BOT_TOKEN
 from handlers.lobby import join_handler, start_callback_handler
-from handlers.game import roll_handler, move_handler
-from handlers.stats import help_handler, stats_handler, credits_handler
+from handlers.game import roll_handler, move_handler, callback_version
+from handlers.stats import help_handler, stats_handler, credits_handler, top_handler, top_callback_handler
 
 app = Client(
     "ludo_bot",
@@ -33,10 +33,24 @@ async def stats_cmd(client, message):
 async def credits_cmd(client, message):
     await credits_handler(client, message)
 
+@app.on_message(filters.command("top"))
+async def top_cmd(client, message):
+    await top_handler(client, message)
+
 @app.on_message(filters.command(["ludo", "team"]) & filters.group)
 async def ludo_cmd(client, message):
     await join_handler(client, message)
 
+@app.on_message(filters.command("quality") & filters.group)
+async def quality_cmd(client, message):
+    from handlers.settings import quality_handler
+    await quality_handler(client, message)
+
+@app.on_message(filters.command("lite") & filters.group)
+async def lite_cmd(client, message):
+    from handlers.settings import lite_handler
+    await lite_handler(client, message)
+
 @app.on_message(filters.command("stop") & filters.group)
 async def stop_cmd(client, message):
     from handlers.game import stop_game_handler
@@ -56,24 +70,23 @@ async def callback_query_handler(client, callback_query):
     elif data == "start":
         await start_callback_handler(client, callback_query)
         
-    elif data == "roll":
-        await roll_handler(client, callback_query)
+    elif data.startswith("top:"):
+        await top_callback_handler(client, callback_query)
+        
+    elif data == "roll" or data.startswith("roll:"):
+        await roll_handler(client, callback_query, callback_version(data))
         
     elif data == "stop":
         from handlers.game import stop_game_handler
         await stop_game_handler(client, callback_query)
         
     elif data.startswith("move_"):
-        token_idx = int(data.split("_")[1])
-        await move_handler(client, callback_query, token_idx)
+        token_idx = int(data.split(":")[0].split("_")[1])
+        await move_handler(client, callback_query, token_idx, callback_version(data))
         
-    elif data == "skip":
-        from handlers.game import skip_turn, send_board
-        from db import db
-        game = await db.get_game(callback_query.message.chat.id)
-        await skip_turn(game)
-        await send_board(client, callback_query.message.chat.id, callback_query.message.id)
-        await callback_query.answer("Turn skipped.")
+    elif data == "skip" or data.startswith("skip:"):
+        from handlers.game import skip_handler
+        await skip_handler(client, callback_query, callback_version(data))
         
     elif data == "help:menu":
         from handlers.menu import help_menu_handler
@@ -0,0 +1,35 @@
+"""
+Bakes the base board, token sprites and dice media into the asset pack.
+
+Run at build time (see Dockerfile / render.yaml):
+    python build_assets.py [output path]
+"""
+import os
+import sys
+import time
+
+# Always draw from source: never re-bake whatever stale pack is already on disk
+os.environ["ASSET_PACK"] = ""
+
+import assets
+import board_renderer
+import dice_renderer
+
+def main():
+    path = sys.argv[1] if len(sys.argv) > 1 else assets.ASSET_PACK_PATH
+    if not path:
+        path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "assets.pack")
+
+    entries = {}
+    entries.update(board_renderer.baked_assets())
+    entries.update(dice_renderer.baked_assets())
+    assets.write_pack(path, entries)
+
+    start = time.perf_counter()
+    loaded = assets.load_pack(path)
+    elapsed = (time.perf_counter() - start) * 1000
+    print(f"Wrote {len(entries)} assets to {path} ({os.path.getsize(path) / 1024:.0f} KB, v{assets.ASSET_PACK_VERSION}); maps in {elapsed:.2f} ms")
+    assert set(loaded) == set(entries)
+
+if __name__ == "__main__":
+    main()
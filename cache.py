@@ -0,0 +1,120 @@
+import time
+from collections import OrderedDict
+
+class LRUCache:
+    """Least-recently-used mapping capped at `max_entries` items."""
+
+    def __init__(self, max_entries):
+        self.max_entries = max_entries
+        self._data = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key, default=None):
+        try:
+            value = self._data[key]
+        except KeyError:
+            self.misses += 1
+            return default
+        self._data.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def put(self, key, value):
+        self._data[key] = value
+        self._data.move_to_end(key)
+        while len(self._data) > self.max_entries:
+            self._data.popitem(last=False)
+            self.evictions += 1
+
+    def pop(self, key, default=None):
+        return self._data.pop(key, default)
+
+    def clear(self):
+        self._data.clear()
+
+    def __contains__(self, key):
+        return key in self._data
+
+    def __len__(self):
+        return len(self._data)
+
+    def stats(self):
+        return {
+            "entries": len(self._data),
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
+
+class ByteLRUCache(LRUCache):
+    """LRU of bytes values capped by their total size rather than by count."""
+
+    def __init__(self, max_bytes):
+        super().__init__(max_entries=None)
+        self.max_bytes = max_bytes
+        self.size = 0
+
+    def put(self, key, value):
+        if len(value) > self.max_bytes:
+            return
+        old = self._data.pop(key, None)
+        if old is not None:
+            self.size -= len(old)
+        self._data[key] = value
+        self.size += len(value)
+        while self.size > self.max_bytes:
+            _, evicted = self._data.popitem(last=False)
+            self.size -= len(evicted)
+            self.evictions += 1
+
+    def pop(self, key, default=None):
+        value = self._data.pop(key, None)
+        if value is None:
+            return default
+        self.size -= len(value)
+        return value
+
+    def clear(self):
+        self._data.clear()
+        self.size = 0
+
+    def stats(self):
+        stats = super().stats()
+        stats["bytes"] = self.size
+        stats["max_bytes"] = self.max_bytes
+        return stats
+
+class TTLCache(LRUCache):
+    """LRU whose entries also expire `ttl` seconds after they were stored."""
+
+    def __init__(self, max_entries, ttl):
+        super().__init__(max_entries)
+        self.ttl = ttl
+        self.expirations = 0
+
+    def get(self, key, default=None):
+        entry = super().get(key)
+        if entry is None:
+            return default
+        expires, value = entry
+        if expires < time.monotonic():
+            del self._data[key]
+            self.hits -= 1
+            self.misses += 1
+            self.expirations += 1
+            return default
+        return value
+
+    def put(self, key, value):
+        super().put(key, (time.monotonic() + self.ttl, value))
+
+    def pop(self, key, default=None):
+        entry = self._data.pop(key, None)
+        return default if entry is None else entry[1]
+
+    def stats(self):
+        stats = super().stats()
+        stats["expirations"] = self.expirations
+        return stats
@@ -20,6 +20,25 @@ if not all([API_ID, API_HASH, BOT_TOKEN, DATABASE_URL]):
 WEBHOOK_URL = os.getenv("WEBHOOK_URL") # e.g. https://your-app.onrender.com/webhook
 TURN_TIMEOUT = int(os.getenv("TURN_TIMEOUT", 90))
 
+# Board rendering runs in worker processes, off the event loop
+# Each worker holds its own Pillow frames and caches, so the default stays low;
+# cpu_count() would report the host's CPUs inside a container
+RENDER_WORKERS = int(os.getenv("RENDER_WORKERS", min(2, len(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else 1)))
+RENDER_QUEUE_SIZE = int(os.getenv("RENDER_QUEUE_SIZE", 32)) # Max renders queued or in flight
+RENDER_QUEUE_TIMEOUT = float(os.getenv("RENDER_QUEUE_TIMEOUT", 5)) # Seconds to wait for a slot
+
+# Postgres connection pool (size it against the server's max_connections across all instances)
+DB_POOL_MIN_SIZE = int(os.getenv("DB_POOL_MIN_SIZE", 2))
+DB_POOL_MAX_SIZE = int(os.getenv("DB_POOL_MAX_SIZE", 10))
+DB_STATEMENT_CACHE_SIZE = int(os.getenv("DB_STATEMENT_CACHE_SIZE", 128)) # Prepared statements kept per connection
+DB_CONN_MAX_IDLE = float(os.getenv("DB_CONN_MAX_IDLE", 300)) # Seconds before an idle connection is closed
+DB_CONN_MAX_QUERIES = int(os.getenv("DB_CONN_MAX_QUERIES", 50000)) # Queries before a connection is recycled
+DB_COMMAND_TIMEOUT = float(os.getenv("DB_COMMAND_TIMEOUT", 10)) # Seconds
+
+# In-process game state cache (invalidated across instances via LISTEN/NOTIFY)
+GAME_CACHE_SIZE = int(os.getenv("GAME_CACHE_SIZE", 1000))
+GAME_CACHE_TTL = float(os.getenv("GAME_CACHE_TTL", 300)) # Seconds
+
 # Colors and Emojis
 COLORS = {
     0: "🔴",  # RED (Top-Left)
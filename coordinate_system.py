@@ -29,26 +29,29 @@ MAIN_PATH_COORDS = [grid_to_px(pos) for pos in MAIN_PATH_GRID]
 
 # HOME PATHS (6 per color)
 # Home entries are from (0,7), (7,14), (14,7), (7,0)
-HOME_PATH_COORDS = {
-    0: [grid_to_px((7, y)) for y in range(13, 7, -1)], # Red (BL) -> Up
-    1: [grid_to_px((x, 7)) for x in range(13, 7, -1)], # Green (BR) -> Left
-    2: [grid_to_px((7, y)) for y in range(1, 7)],      # Yellow (TR) -> Down
-    3: [grid_to_px((x, 7)) for x in range(1, 7)],      # Blue (TL) -> Right
+HOME_PATH_GRID = {
+    0: [(7, y) for y in range(13, 7, -1)], # Red (BL) -> Up
+    1: [(x, 7) for x in range(13, 7, -1)], # Green (BR) -> Left
+    2: [(7, y) for y in range(1, 7)],      # Yellow (TR) -> Down
+    3: [(x, 7) for x in range(1, 7)],      # Blue (TL) -> Right
 }
+HOME_PATH_COORDS = {color: [grid_to_px(pos) for pos in path] for color, path in HOME_PATH_GRID.items()}
 
 # Base Slot Pixels (re-aligned to centers of white squares)
-HOME_BASE_COORDS = {
-    0: [grid_to_px(p) for p in [(1.5, 10.5), (1.5, 12.5), (3.5, 10.5), (3.5, 12.5)]], # Red (BL)
-    1: [grid_to_px(p) for p in [(10.5, 10.5), (10.5, 12.5), (12.5, 10.5), (12.5, 12.5)]], # Green (BR)
-    2: [grid_to_px(p) for p in [(10.5, 1.5), (10.5, 3.5), (12.5, 1.5), (12.5, 3.5)]], # Yellow (TR)
-    3: [grid_to_px(p) for p in [(1.5, 1.5), (1.5, 3.5), (3.5, 1.5), (3.5, 3.5)]], # Blue (TL)
+HOME_BASE_GRID = {
+    0: [(1.5, 10.5), (1.5, 12.5), (3.5, 10.5), (3.5, 12.5)], # Red (BL)
+    1: [(10.5, 10.5), (10.5, 12.5), (12.5, 10.5), (12.5, 12.5)], # Green (BR)
+    2: [(10.5, 1.5), (10.5, 3.5), (12.5, 1.5), (12.5, 3.5)], # Yellow (TR)
+    3: [(1.5, 1.5), (1.5, 3.5), (3.5, 1.5), (3.5, 3.5)], # Blue (TL)
 }
+HOME_BASE_COORDS = {color: [grid_to_px(pos) for pos in slots] for color, slots in HOME_BASE_GRID.items()}
 
 # Safe zone indices in the 52-step path (indices matching stars in user image)
 # Blue:10, Blue+5:15, Red:23, Red+5:28, Green:36, Green+5:41, Yellow:49, Yellow+5:2
 SAFE_ZONE_INDICES = {10, 15, 23, 28, 36, 41, 49, 2}
 
-def get_token_pixel_position(color, logical_position, token_index=0):
+def compute_token_pixel_position(color, logical_position, token_index=0):
+    """Reference mapping the lookup tables are built from."""
     if logical_position == -1:
         return HOME_BASE_COORDS[color][token_index]
     if logical_position == 99:
@@ -65,3 +68,43 @@ def get_token_pixel_position(color, logical_position, token_index=0):
         stretch_idx = logical_position - 52
         return HOME_PATH_COORDS[color][stretch_idx]
     return (0, 0)
+
+def compute_token_cell(color, logical_position, token_index=0):
+    """Grid square (x, y) a token is drawn on, or None when finished."""
+    if logical_position == -1:
+        x, y = HOME_BASE_GRID[color][token_index]
+        return (int(x), int(y))
+    if 0 <= logical_position <= 51:
+        return MAIN_PATH_GRID[logical_position]
+    if 52 <= logical_position <= 57:
+        return HOME_PATH_GRID[color][logical_position - 52]
+    return None
+
+# Flat lookup tables indexed by token_slot(): positions -1..99 map to 0..100,
+# positions no token can hold (58-98) give (0, 0) / None. Hot paths inline
+# the index arithmetic instead of calling token_slot().
+POSITION_SPAN = 101
+
+def token_slot(color, logical_position, token_index=0):
+    return (color * POSITION_SPAN + logical_position + 1) * 4 + token_index
+
+TOKEN_PIXELS = tuple(
+    compute_token_pixel_position(color, pos, t_idx)
+    for color in range(4) for pos in range(-1, 100) for t_idx in range(4)
+)
+TOKEN_CELLS = tuple(
+    compute_token_cell(color, pos, t_idx)
+    for color in range(4) for pos in range(-1, 100) for t_idx in range(4)
+)
+
+# Pixel offset (applied to x and y) of each token when 1-4 tokens share a square
+STACK_STEP = 15
+STACK_OFFSETS = tuple(
+    tuple(round((i - (count - 1) / 2) * STACK_STEP) for i in range(count))
+    for count in range(5)
+)
+
+def get_token_pixel_position(color, logical_position, token_index=0):
+    if -1 <= logical_position <= 99:
+        return TOKEN_PIXELS[(color * POSITION_SPAN + logical_position + 1) * 4 + token_index]
+    return (0, 0)
@@ -1,23 +1,586 @@
+import asyncio
 import asyncpg
+import copy
 import json
-from config import DATABASE_URL
+from config import (
+    DATABASE_URL, GAME_CACHE_SIZE, GAME_CACHE_TTL,
+    DB_POOL_MIN_SIZE, DB_POOL_MAX_SIZE, DB_STATEMENT_CACHE_SIZE,
+    DB_CONN_MAX_IDLE, DB_CONN_MAX_QUERIES, DB_COMMAND_TIMEOUT
+)
+from cache import LRUCache, TTLCache
+from game_logic import TRANSITIONS, DB_GEOMETRY
+from rules_core import KILLABLE
+
+try:
+    import orjson
+    def json_dumps(value): return orjson.dumps(value).decode()
+    json_loads = orjson.loads
+except ImportError:
+    json_dumps, json_loads = json.dumps, json.loads
+
+FILE_ID_CACHE_SIZE = 4096
+STATS_CACHE_SIZE = 4096
+STATS_CACHE_TTL = 60 # Seconds; bounds how stale someone else's win can leave a rank
+LEADERBOARD_PAGE_SIZE = 10
+SNAPSHOT_INTERVAL = 20 # Game versions between history snapshots
+STATE_DOC_CACHE_SIZE = 1024
+
+# Ranks come from win_counts (how many users have exactly N wins), kept in step
+# with users by triggers: a rank sums one row per distinct win count above the
+# user's, so it costs the same with ten thousand users or ten million.
+RANKING_SCHEMA = """
+CREATE TABLE IF NOT EXISTS win_counts (
+    wins INTEGER PRIMARY KEY,
+    users BIGINT NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS users_wins_idx ON users (wins DESC, user_id);
+
+CREATE OR REPLACE FUNCTION ludo_count_wins() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP IN ('UPDATE', 'DELETE') THEN
+        UPDATE win_counts SET users = users - 1 WHERE wins = OLD.wins;
+    END IF;
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+        INSERT INTO win_counts (wins, users) VALUES (NEW.wins, 1)
+        ON CONFLICT (wins) DO UPDATE SET users = win_counts.users + 1;
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS ludo_users_count ON users;
+CREATE TRIGGER ludo_users_count AFTER INSERT OR DELETE ON users
+    FOR EACH ROW EXECUTE FUNCTION ludo_count_wins();
+DROP TRIGGER IF EXISTS ludo_users_count_wins ON users;
+CREATE TRIGGER ludo_users_count_wins AFTER UPDATE OF wins ON users
+    FOR EACH ROW WHEN (OLD.wins IS DISTINCT FROM NEW.wins) EXECUTE FUNCTION ludo_count_wins();
+
+-- One-off backfill for databases that had users before win_counts existed
+DO $$
+BEGIN
+    IF NOT EXISTS (SELECT 1 FROM win_counts) THEN
+        LOCK TABLE users IN SHARE MODE;
+        INSERT INTO win_counts (wins, users) SELECT wins, count(*) FROM users GROUP BY wins;
+    END IF;
+END $$;
+"""
+
+RANK_SQL = "1 + COALESCE((SELECT sum(w.users) FROM win_counts w WHERE w.wins > u.wins), 0)::bigint"
+
+# Token positions live on the game row: positions[color * 4 + token_index + 1]
+# (-1 base, 0-51 main path, 52-57 home stretch, 99 finished). A move is a
+# single-row write and reading a game needs no per-token rows. Databases from
+# before this layout have their tokens rows folded in once, then dropped.
+POSITIONS_SCHEMA = """
+ALTER TABLE games ADD COLUMN IF NOT EXISTS positions SMALLINT[] NOT NULL
+    DEFAULT array_fill(-1::smallint, ARRAY[16]);
+
+DO $$
+BEGIN
+    IF to_regclass('tokens') IS NOT NULL THEN
+        LOCK TABLE games, players, tokens IN EXCLUSIVE MODE;
+        UPDATE games g SET positions = m.positions
+        FROM (
+            SELECT gs.id, array_agg(COALESCE(t.position, -1)::smallint ORDER BY s.slot) AS positions
+            FROM games gs
+            CROSS JOIN generate_series(0, 15) AS s(slot)
+            LEFT JOIN players p ON p.game_id = gs.id AND p.color = s.slot / 4
+            LEFT JOIN tokens t ON t.player_id = p.id AND t.token_index = s.slot % 4
+            GROUP BY gs.id
+        ) m
+        WHERE g.id = m.id;
+        DROP TABLE tokens;
+    END IF;
+END $$;
+"""
+
+# Game history: every applied roll, move (with its kills) and skip is appended
+# to game_events, and the head state is copied to game_snapshots every
+# SNAPSHOT_INTERVAL versions, so ludo_replay() rebuilds any point of a game from
+# one snapshot plus a short tail. The games row stays the live head the commands
+# read. Both tables are range-partitioned by month; history outlives the game
+# row, and old months are dropped by detaching their partitions.
+HISTORY_SCHEMA = """
+CREATE TABLE IF NOT EXISTS game_events (
+    game_id INTEGER NOT NULL,
+    seq INTEGER NOT NULL,
+    kind TEXT NOT NULL,
+    user_id BIGINT,
+    dice SMALLINT,
+    slot SMALLINT,
+    from_pos SMALLINT,
+    to_pos SMALLINT,
+    killed SMALLINT[],
+    turn SMALLINT NOT NULL,
+    dice_value SMALLINT NOT NULL,
+    sixes SMALLINT NOT NULL,
+    created_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+    PRIMARY KEY (game_id, seq, created_at)
+) PARTITION BY RANGE (created_at);
+
+CREATE TABLE IF NOT EXISTS game_snapshots (
+    game_id INTEGER NOT NULL,
+    chat_id BIGINT NOT NULL,
+    seq INTEGER NOT NULL,
+    status TEXT NOT NULL,
+    team_mode BOOLEAN NOT NULL,
+    current_turn_index INTEGER NOT NULL,
+    dice_value INTEGER NOT NULL,
+    consecutive_sixes INTEGER NOT NULL,
+    positions SMALLINT[] NOT NULL,
+    created_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+    PRIMARY KEY (game_id, seq, created_at)
+) PARTITION BY RANGE (created_at);
+
+-- Rows dated past the last monthly partition land here until it exists
+CREATE TABLE IF NOT EXISTS game_events_default PARTITION OF game_events DEFAULT;
+CREATE TABLE IF NOT EXISTS game_snapshots_default PARTITION OF game_snapshots DEFAULT;
+
+-- Creates the month's partitions, first moving any of its rows out of the default one
+CREATE OR REPLACE FUNCTION ludo_history_partitions(p_month DATE) RETURNS void AS $$
+DECLARE
+    lo DATE := date_trunc('month', p_month);
+    hi DATE := date_trunc('month', p_month) + INTERVAL '1 month';
+    parent TEXT;
+    part TEXT;
+BEGIN
+    FOREACH parent IN ARRAY ARRAY['game_events', 'game_snapshots'] LOOP
+        part := parent || '_' || to_char(lo, 'YYYYMM');
+        CONTINUE WHEN to_regclass(part) IS NOT NULL;
+        EXECUTE format('CREATE TABLE %I (LIKE %I INCLUDING DEFAULTS)', part, parent);
+        EXECUTE format(
+            'WITH moved AS (DELETE FROM %I WHERE created_at >= %L AND created_at < %L RETURNING *) INSERT INTO %I SELECT * FROM moved',
+            parent || '_default', lo, hi, part
+        );
+        EXECUTE format('ALTER TABLE %I ATTACH PARTITION %I FOR VALUES FROM (%L) TO (%L)', parent, part, lo, hi);
+    END LOOP;
+END;
+$$ LANGUAGE plpgsql;
+
+SELECT ludo_history_partitions(CURRENT_DATE);
+SELECT ludo_history_partitions((CURRENT_DATE + INTERVAL '1 month')::date);
+"""
+
+# Queries run on every click. asyncpg prepares each distinct query text once per
+# connection and reuses the plan from its statement cache; warm_pool() primes
+# them on every pooled connection at startup.
+HOT_QUERIES = {
+    'game': "SELECT ludo_game_state($1)",
+    'roll': "SELECT ludo_roll($1, $2, $3, $4)",
+    'move': "SELECT ludo_move($1, $2, $3, $4)",
+    'skip': "SELECT ludo_skip($1, $2, $3)",
+    'settings': "SELECT render_profile, lite_mode FROM chat_settings WHERE chat_id = $1",
+}
+
+# Game commands run server-side: each one validates, mutates and returns the new
+# state in a single round trip. Writes are a compare-and-set on games.version
+# (the version the caller's buttons were built from, or the one just read), so
+# concurrent or stale clicks get 'stale' instead of waiting on a row lock.
+# Movement comes from game_logic.TRANSITIONS and kills from the rules core's masks
+# (DB_GEOMETRY.safe, KILLABLE); victory mirrors team_logic.check_team_victory.
+GAME_FUNCTIONS = """
+-- Every UPDATE of a game bumps its version, and every change is broadcast as
+-- "chat_id:id:version" (or "chat_id:id:deleted") so each instance can evict its cached copy.
+CREATE OR REPLACE FUNCTION ludo_games_bump_version() RETURNS trigger AS $$
+BEGIN
+    NEW.version := OLD.version + 1;
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION ludo_games_changed() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP = 'DELETE' THEN
+        PERFORM pg_notify('ludo_games', OLD.chat_id || ':' || OLD.id || ':deleted');
+        RETURN OLD;
+    END IF;
+    PERFORM pg_notify('ludo_games', NEW.chat_id || ':' || NEW.id || ':' || NEW.version);
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS ludo_games_version ON games;
+CREATE TRIGGER ludo_games_version BEFORE UPDATE ON games
+    FOR EACH ROW EXECUTE FUNCTION ludo_games_bump_version();
+DROP TRIGGER IF EXISTS ludo_games_notify ON games;
+CREATE TRIGGER ludo_games_notify AFTER INSERT OR UPDATE OR DELETE ON games
+    FOR EACH ROW EXECUTE FUNCTION ludo_games_changed();
+
+-- Token dicts are expanded from games.positions, so callers see the same shape
+-- the old per-token rows produced ('id' is the slot, color * 4 + token_index).
+CREATE OR REPLACE FUNCTION ludo_game_state(p_chat_id BIGINT) RETURNS jsonb AS $$
+    SELECT (to_jsonb(g) - 'positions') || jsonb_build_object('players', COALESCE((
+        SELECT jsonb_agg(to_jsonb(p) || jsonb_build_object('tokens', (
+            SELECT jsonb_agg(jsonb_build_object(
+                'id', p.color * 4 + i, 'token_index', i,
+                'position', g.positions[p.color * 4 + i + 1],
+                'is_finished', g.positions[p.color * 4 + i + 1] = 99
+            ) ORDER BY i) FROM generate_series(0, 3) AS i
+        )) ORDER BY p.color)
+        FROM players p WHERE p.game_id = g.id
+    ), '[]'::jsonb))
+    FROM games g WHERE g.chat_id = p_chat_id
+$$ LANGUAGE sql STABLE;
+
+-- Logs one applied command against the game row it produced (seq = that row's
+-- version) and snapshots the head when the last snapshot is {snapshot_interval}+ versions
+-- old or the game has finished.
+CREATE OR REPLACE FUNCTION ludo_append_event(
+    head games, p_kind TEXT, p_user_id BIGINT, p_dice INTEGER DEFAULT NULL, p_slot INTEGER DEFAULT NULL,
+    p_from INTEGER DEFAULT NULL, p_to INTEGER DEFAULT NULL, p_killed SMALLINT[] DEFAULT NULL
+) RETURNS void AS $$
+BEGIN
+    INSERT INTO game_events (game_id, seq, kind, user_id, dice, slot, from_pos, to_pos, killed, turn, dice_value, sixes)
+    VALUES (head.id, head.version, p_kind, p_user_id, p_dice, p_slot, p_from, p_to, NULLIF(p_killed, '{{}}'),
+            head.current_turn_index, head.dice_value, head.consecutive_sixes);
+    IF head.status <> 'PLAYING' OR NOT EXISTS (
+        SELECT 1 FROM game_snapshots s WHERE s.game_id = head.id AND s.seq > head.version - {snapshot_interval}
+    ) THEN
+        INSERT INTO game_snapshots (game_id, chat_id, seq, status, team_mode, current_turn_index, dice_value, consecutive_sixes, positions)
+        VALUES (head.id, head.chat_id, head.version, head.status, head.team_mode,
+                head.current_turn_index, head.dice_value, head.consecutive_sixes, head.positions);
+    END IF;
+END;
+$$ LANGUAGE plpgsql;
+
+-- State of a game at `p_seq` (default: its last event), rebuilt from the newest
+-- snapshot at or before it plus the events after that. Works for finished games
+-- too, after settle_game has deleted the head row.
+CREATE OR REPLACE FUNCTION ludo_replay(p_game_id INTEGER, p_seq INTEGER DEFAULT NULL) RETURNS jsonb AS $$
+DECLARE
+    snap game_snapshots%ROWTYPE;
+    e game_events%ROWTYPE;
+    pos SMALLINT[];
+    k SMALLINT;
+BEGIN
+    SELECT * INTO snap FROM game_snapshots
+    WHERE game_id = p_game_id AND (p_seq IS NULL OR seq <= p_seq)
+    ORDER BY seq DESC LIMIT 1;
+    IF NOT FOUND THEN RETURN NULL; END IF;
+    pos := snap.positions;
+    FOR e IN SELECT * FROM game_events
+             WHERE game_id = p_game_id AND seq > snap.seq AND (p_seq IS NULL OR seq <= p_seq)
+             ORDER BY seq LOOP
+        IF e.slot IS NOT NULL THEN pos[e.slot + 1] := e.to_pos; END IF;
+        FOREACH k IN ARRAY COALESCE(e.killed, '{{}}') LOOP pos[k + 1] := -1; END LOOP;
+        IF e.kind IN ('won', 'team_won') THEN snap.status := 'FINISHED'; END IF;
+        snap.seq := e.seq;
+        snap.current_turn_index := e.turn;
+        snap.dice_value := e.dice_value;
+        snap.consecutive_sixes := e.sixes;
+    END LOOP;
+    snap.positions := pos;
+    RETURN to_jsonb(snap) - 'created_at';
+END;
+$$ LANGUAGE plpgsql STABLE;
+
+-- game_logic.TRANSITIONS as a flat array: the new position of a token of
+-- p_color at p_pos after rolling p_dice, unchanged when the move is illegal.
+CREATE OR REPLACE FUNCTION ludo_next_position(p_color INTEGER, p_pos INTEGER, p_dice INTEGER) RETURNS INTEGER AS $$
+    SELECT ({moves}::smallint[])[(p_color * 101 + p_pos + 1) * 6 + p_dice]
+$$ LANGUAGE sql IMMUTABLE;
+
+DROP FUNCTION IF EXISTS ludo_roll(BIGINT, BIGINT, INTEGER);
+DROP FUNCTION IF EXISTS ludo_move(BIGINT, BIGINT, INTEGER);
+DROP FUNCTION IF EXISTS ludo_skip(BIGINT, BIGINT);
+
+CREATE OR REPLACE FUNCTION ludo_roll(p_chat_id BIGINT, p_user_id BIGINT, p_value INTEGER, p_version INTEGER) RETURNS jsonb AS $$
+DECLARE
+    g games%ROWTYPE;
+    cur players%ROWTYPE;
+    head games%ROWTYPE;
+    n_players INTEGER;
+    sixes INTEGER;
+    outcome TEXT := 'rolled';
+BEGIN
+    SELECT * INTO g FROM games WHERE chat_id = p_chat_id;
+    IF NOT FOUND THEN RETURN jsonb_build_object('result', 'not_found'); END IF;
+    IF g.version <> COALESCE(p_version, g.version) THEN RETURN jsonb_build_object('result', 'stale'); END IF;
+    IF g.status <> 'PLAYING' THEN RETURN jsonb_build_object('result', 'not_active'); END IF;
+    SELECT count(*) INTO n_players FROM players WHERE game_id = g.id;
+    SELECT * INTO cur FROM players WHERE game_id = g.id ORDER BY color OFFSET g.current_turn_index LIMIT 1;
+    IF cur.user_id IS DISTINCT FROM p_user_id THEN RETURN jsonb_build_object('result', 'not_turn'); END IF;
+    IF g.dice_value <> 0 THEN RETURN jsonb_build_object('result', 'already_rolled'); END IF;
+
+    sixes := CASE WHEN p_value = 6 THEN g.consecutive_sixes + 1 ELSE 0 END;
+    IF sixes >= 3 THEN
+        outcome := 'three_sixes';
+    ELSIF NOT EXISTS (
+        SELECT 1 FROM unnest(g.positions[cur.color * 4 + 1 : cur.color * 4 + 4]) AS t(position)
+        WHERE ludo_next_position(cur.color, t.position, p_value) <> t.position
+    ) THEN
+        outcome := 'no_moves';
+    END IF;
+
+    IF outcome = 'rolled' THEN
+        UPDATE games SET dice_value = p_value, consecutive_sixes = sixes WHERE id = g.id AND version = g.version
+        RETURNING * INTO head;
+    ELSE
+        UPDATE games SET current_turn_index = (g.current_turn_index + 1) % n_players, dice_value = 0, consecutive_sixes = 0
+        WHERE id = g.id AND version = g.version
+        RETURNING * INTO head;
+    END IF;
+    -- Compare-and-set lost: another command changed the game since we read it
+    IF NOT FOUND THEN RETURN jsonb_build_object('result', 'stale'); END IF;
+    PERFORM ludo_append_event(head, outcome, p_user_id, p_value);
+    RETURN jsonb_build_object('result', outcome, 'dice', p_value, 'player', to_jsonb(cur), 'game', ludo_game_state(p_chat_id));
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION ludo_move(p_chat_id BIGINT, p_user_id BIGINT, p_token_index INTEGER, p_version INTEGER) RETURNS jsonb AS $$
+DECLARE
+    g games%ROWTYPE;
+    cur players%ROWTYPE;
+    head games%ROWTYPE;
+    pos SMALLINT[];
+    slot INTEGER;
+    old_pos INTEGER;
+    n_players INTEGER;
+    new_pos INTEGER;
+    pass_turn BOOLEAN;
+    killed INTEGER := 0;
+    killed_slots SMALLINT[] := '{{}}';
+    killable INTEGER;
+    winner_team INTEGER;
+    outcome TEXT := 'moved';
+BEGIN
+    SELECT * INTO g FROM games WHERE chat_id = p_chat_id;
+    IF NOT FOUND THEN RETURN jsonb_build_object('result', 'not_found'); END IF;
+    IF g.version <> COALESCE(p_version, g.version) THEN RETURN jsonb_build_object('result', 'stale'); END IF;
+    IF g.status <> 'PLAYING' THEN RETURN jsonb_build_object('result', 'not_active'); END IF;
+    SELECT count(*) INTO n_players FROM players WHERE game_id = g.id;
+    SELECT * INTO cur FROM players WHERE game_id = g.id ORDER BY color OFFSET g.current_turn_index LIMIT 1;
+    IF cur.user_id IS DISTINCT FROM p_user_id THEN RETURN jsonb_build_object('result', 'not_turn'); END IF;
+    IF g.dice_value <= 0 THEN RETURN jsonb_build_object('result', 'not_rolled'); END IF;
+    IF p_token_index NOT BETWEEN 0 AND 3 THEN RETURN jsonb_build_object('result', 'invalid'); END IF;
+    pos := g.positions;
+    slot := cur.color * 4 + p_token_index + 1;
+    old_pos := pos[slot];
+
+    new_pos := ludo_next_position(cur.color, old_pos, g.dice_value);
+    IF new_pos = old_pos THEN RETURN jsonb_build_object('result', 'invalid'); END IF;
+    pos[slot] := new_pos;
+
+    -- Kills: the slots rules_core.KILLABLE[team_mode][color] allows on the landing
+    -- square, unless it is a safe square (bit set in DB_GEOMETRY.safe).
+    -- Slots of absent colours hold -1, so they never match a main-path square.
+    IF new_pos BETWEEN 0 AND 51 AND ({safe}::bigint >> new_pos) & 1 = 0 THEN
+        killable := ({killable}::integer[])[g.team_mode::integer * 4 + cur.color + 1];
+        FOR i IN 1..16 LOOP
+            IF pos[i] = new_pos AND (killable >> (i - 1)) & 1 = 1 THEN
+                pos[i] := -1;
+                killed := killed + 1;
+                killed_slots := killed_slots || (i - 1)::smallint;
+            END IF;
+        END LOOP;
+    END IF;
+
+    IF g.team_mode THEN
+        SELECT p.team_id INTO winner_team FROM players p WHERE p.game_id = g.id
+        GROUP BY p.team_id HAVING bool_and(99 = ALL (pos[p.color * 4 + 1 : p.color * 4 + 4]))
+        ORDER BY p.team_id LIMIT 1;
+        IF winner_team IS NOT NULL THEN outcome := 'team_won'; END IF;
+    ELSIF 99 = ALL (pos[cur.color * 4 + 1 : cur.color * 4 + 4]) THEN
+        outcome := 'won';
+    END IF;
+
+    -- The whole move is one compare-and-set write of the game row. The dice is
+    -- spent whatever happens; a 6 or a kill keeps the turn; a finished game
+    -- takes no more commands (settle_game scores and deletes it).
+    pass_turn := outcome = 'moved' AND g.dice_value <> 6 AND killed = 0;
+    UPDATE games SET
+        positions = pos,
+        dice_value = 0,
+        status = CASE WHEN outcome = 'moved' THEN status ELSE 'FINISHED' END,
+        current_turn_index = CASE WHEN pass_turn THEN (g.current_turn_index + 1) % n_players ELSE current_turn_index END,
+        consecutive_sixes = CASE WHEN pass_turn THEN 0 ELSE consecutive_sixes END
+    WHERE id = g.id AND version = g.version
+    RETURNING * INTO head;
+    IF NOT FOUND THEN RETURN jsonb_build_object('result', 'stale'); END IF;
+    PERFORM ludo_append_event(head, outcome, p_user_id, g.dice_value, slot - 1, old_pos, new_pos, killed_slots);
+    RETURN jsonb_build_object(
+        'result', outcome, 'killed', killed, 'winner_team', winner_team,
+        'player', to_jsonb(cur), 'game', ludo_game_state(p_chat_id)
+    );
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION ludo_skip(p_chat_id BIGINT, p_user_id BIGINT, p_version INTEGER) RETURNS jsonb AS $$
+DECLARE
+    g games%ROWTYPE;
+    cur players%ROWTYPE;
+    head games%ROWTYPE;
+    n_players INTEGER;
+BEGIN
+    SELECT * INTO g FROM games WHERE chat_id = p_chat_id;
+    IF NOT FOUND THEN RETURN jsonb_build_object('result', 'not_found'); END IF;
+    IF g.version <> COALESCE(p_version, g.version) THEN RETURN jsonb_build_object('result', 'stale'); END IF;
+    IF g.status <> 'PLAYING' THEN RETURN jsonb_build_object('result', 'not_active'); END IF;
+    SELECT count(*) INTO n_players FROM players WHERE game_id = g.id;
+    SELECT * INTO cur FROM players WHERE game_id = g.id ORDER BY color OFFSET g.current_turn_index LIMIT 1;
+    IF cur.user_id IS DISTINCT FROM p_user_id THEN RETURN jsonb_build_object('result', 'not_turn'); END IF;
+
+    UPDATE games SET current_turn_index = (g.current_turn_index + 1) % n_players, dice_value = 0, consecutive_sixes = 0
+    WHERE id = g.id AND version = g.version
+    RETURNING * INTO head;
+    IF NOT FOUND THEN RETURN jsonb_build_object('result', 'stale'); END IF;
+    PERFORM ludo_append_event(head, 'skipped', p_user_id);
+    RETURN jsonb_build_object('result', 'skipped', 'player', to_jsonb(cur), 'game', ludo_game_state(p_chat_id));
+END;
+$$ LANGUAGE plpgsql;
+""".format(
+    moves="'{%s}'" % ",".join(str(move[0]) for color in TRANSITIONS for row in color for move in row),
+    safe=DB_GEOMETRY.safe,
+    killable="'{%s}'" % ",".join(str(mask) for masks in KILLABLE for mask in masks),
+    snapshot_interval=SNAPSHOT_INTERVAL,
+)
+
+def _doc_changes(old, new, path=()):
+    """
+    The smallest set of path writes turning JSON document `old` into `new`:
+    descends into objects and same-length arrays, so one moved token is one
+    write at ["players", "1", "tokens", "2", "pos"]. Removed keys have no "value".
+    """
+    if old == new: return []
+    if isinstance(old, dict) and isinstance(new, dict):
+        changes = [{'path': [*path, k]} for k in old if k not in new]
+        for k, v in new.items():
+            if k in old: changes += _doc_changes(old[k], v, (*path, k))
+            else: changes.append({'path': [*path, k], 'value': v})
+        return changes
+    if isinstance(old, list) and isinstance(new, list) and len(old) == len(new):
+        changes = []
+        for i, (a, b) in enumerate(zip(old, new)):
+            changes += _doc_changes(a, b, (*path, str(i)))
+        return changes
+    return [{'path': list(path), 'value': new}]
+
+def decode_json(value):
+    # Safety net: the pool registers a codec, other connections return json/jsonb as text
+    return json_loads(value) if isinstance(value, str) else value
+
+async def init_connection(conn):
+    """Pool init hook: decode json/jsonb straight into Python objects."""
+    for typename in ('json', 'jsonb'):
+        await conn.set_type_codec(typename, encoder=json_dumps, decoder=json_loads, schema='pg_catalog')
 
 class LudoDB:
     def __init__(self):
         self.pool = None
+        # chat_id -> chat_settings row (render_profile None = deployment default)
+        self.settings_cache = LRUCache(1024)
+        # Rendered image content hash -> Telegram file_id (persisted in media_cache)
+        self.file_id_cache = LRUCache(FILE_ID_CACHE_SIZE)
+        # chat_id -> game state. Write-through: commands store the state they return.
+        # Only used while `listener` is subscribed to invalidations.
+        self.game_cache = TTLCache(GAME_CACHE_SIZE, GAME_CACHE_TTL)
+        # chat_id -> newest (game id, version) notified, cached or not: a read that
+        # raced a write elsewhere must not cache the state it fetched before the write
+        self.game_floors = LRUCache(GAME_CACHE_SIZE)
+        # user_id -> stats row with rank, and keyset cursor -> leaderboard page
+        self.stats_cache = TTLCache(STATS_CACHE_SIZE, STATS_CACHE_TTL)
+        self.leaderboard_cache = TTLCache(64, STATS_CACHE_TTL)
+        # (table, key) -> (rev, copy of the last document read or written), so saves send only changed fields
+        self.state_docs = LRUCache(STATE_DOC_CACHE_SIZE)
+        self.listener = None
 
     async def connect(self):
         if not self.pool:
-            self.pool = await asyncpg.create_pool(DATABASE_URL)
+            self.pool = await asyncpg.create_pool(
+                DATABASE_URL,
+                min_size=DB_POOL_MIN_SIZE,
+                max_size=DB_POOL_MAX_SIZE,
+                statement_cache_size=DB_STATEMENT_CACHE_SIZE,
+                max_inactive_connection_lifetime=DB_CONN_MAX_IDLE,
+                max_queries=DB_CONN_MAX_QUERIES,
+                command_timeout=DB_COMMAND_TIMEOUT,
+                init=init_connection
+            )
+
+    async def warm_pool(self):
+        """Opens min_size connections and prepares every hot query on each of them."""
+        conns = [await self.pool.acquire() for _ in range(min(DB_POOL_MIN_SIZE, DB_POOL_MAX_SIZE))]
+        try:
+            for conn in conns:
+                for query in HOT_QUERIES.values():
+                    # NULL arguments match no chat, so the commands return without writing
+                    await conn.fetch(query, *[None] * query.count('$'))
+        finally:
+            for conn in conns:
+                await self.pool.release(conn)
 
     async def disconnect(self):
+        if self.listener:
+            listener, self.listener = self.listener, None
+            await listener.close()
         if self.pool:
             await self.pool.close()
+
+    async def listen(self, delay=0):
+        """
+        Subscribes to game change notifications on a dedicated connection, so
+        writes from any instance evict stale cached games. The cache stays off
+        while there is no subscription.
+        """
+        await asyncio.sleep(delay)
+        try:
+            listener = await asyncpg.connect(DATABASE_URL)
+            await listener.add_listener('ludo_games', self._on_game_changed)
+            listener.add_termination_listener(self._on_listener_lost)
+            self.listener = listener
+        except Exception as e:
+            print(f"Game cache listener unavailable, reading games from the database: {e}")
+
+    def _on_game_changed(self, connection, pid, channel, payload):
+        chat_id, game_id, version = payload.split(':')
+        chat_id = int(chat_id)
+        # Game ids are serial, so (id, version) orders every state a chat's row has held
+        seen = (int(game_id), float('inf') if version == 'deleted' else int(version))
+        if seen > self.game_floors.get(chat_id, (0, -1)):
+            self.game_floors.put(chat_id, seen)
+        cached = self.game_cache.get(chat_id)
+        # Our own writes come back here too; keep the entry if it is already that new
+        if cached is not None and (cached['id'], cached['version']) < seen:
+            self.game_cache.pop(chat_id)
+
+    def _on_listener_lost(self, connection):
+        if connection is not self.listener: return # Closed by disconnect()
+        # Notifications may have been missed: drop everything and resubscribe
+        self.listener = None
+        self.game_cache.clear()
+        asyncio.get_running_loop().create_task(self.listen(delay=5))
+
+    def cache_game(self, game):
+        """
+        Stores `game` unless a newer version of it is already cached or has
+        been notified since it was read. Returns `game`.
+        """
+        if game and self.listener:
+            state = (game['id'], game['version'])
+            if state < self.game_floors.get(game['chat_id'], (0, -1)):
+                return game
+            cached = self.game_cache.get(game['chat_id'])
+            if cached is None or (cached['id'], cached['version']) <= state:
+                self.game_cache.put(game['chat_id'], game)
+        return game
+
+    def evict_game(self, chat_id):
+        """Drops the cached game, e.g. when a client shows a newer version than the cache."""
+        self.game_cache.pop(chat_id)
+
+    def cached_game(self, chat_id):
+        # Memory only: for cheap pre-checks that must not cost a round trip
+        return self.game_cache.get(chat_id) if self.listener else None
+
+    def _cache_outcome(self, outcome):
+        if 'game' in outcome:
+            self.cache_game(outcome['game'])
+        return outcome
     async def init_db(self):
         await self.connect()
         async with self.pool.acquire() as conn:
             # Database is now initialized with correct schema
-            # await conn.execute("DROP TABLE IF EXISTS tokens, players, games CASCADE")
+            # await conn.execute("DROP TABLE IF EXISTS players, games CASCADE")
             
             # Games Table
             await conn.execute("""
@@ -46,17 +609,6 @@ class LudoDB:
                     UNIQUE(game_id, user_id)
                 )
             """)
-            # Tokens Table
-            await conn.execute("""
-                CREATE TABLE IF NOT EXISTS tokens (
-                    id SERIAL PRIMARY KEY,
-                    player_id INTEGER REFERENCES players(id) ON DELETE CASCADE,
-                    token_index INTEGER,
-                    position INTEGER DEFAULT -1,
-                    is_finished BOOLEAN DEFAULT FALSE,
-                    UNIQUE(player_id, token_index)
-                )
-            """)
             # Users Stats Table
             await conn.execute("""
                 CREATE TABLE IF NOT EXISTS users (
@@ -68,76 +620,146 @@ class LudoDB:
                     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
                 )
             """)
+            # Incremental rank counts + leaderboard index
+            await conn.execute(RANKING_SCHEMA)
+            # Per-chat settings (outlive individual games)
+            await conn.execute("""
+                CREATE TABLE IF NOT EXISTS chat_settings (
+                    chat_id BIGINT PRIMARY KEY,
+                    render_profile TEXT
+                )
+            """)
+            await conn.execute("ALTER TABLE chat_settings ADD COLUMN IF NOT EXISTS lite_mode BOOLEAN DEFAULT FALSE")
+            # Telegram file_ids of uploaded board images, by content hash
+            await conn.execute("""
+                CREATE TABLE IF NOT EXISTS media_cache (
+                    content_hash TEXT PRIMARY KEY,
+                    file_id TEXT NOT NULL,
+                    used_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                )
+            """)
+            await conn.execute("DELETE FROM media_cache WHERE used_at < CURRENT_TIMESTAMP - INTERVAL '30 days'")
+            # ludo.manager state documents (GameState / Tournament .to_dict()), one row each
+            await conn.execute("""
+                CREATE TABLE IF NOT EXISTS game_states (
+                    chat_id BIGINT PRIMARY KEY,
+                    doc JSONB NOT NULL,
+                    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                )
+            """)
+            await conn.execute("""
+                CREATE TABLE IF NOT EXISTS tournament_states (
+                    tournament_id TEXT PRIMARY KEY,
+                    doc JSONB NOT NULL,
+                    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                )
+            """)
+            # Bumped on every write, so a patch only lands on the revision it was diffed against
+            for table in ('game_states', 'tournament_states'):
+                await conn.execute(f"ALTER TABLE {table} ADD COLUMN IF NOT EXISTS rev INTEGER NOT NULL DEFAULT 0")
+            # Applies _doc_changes() output: [{"path": [...], "value": ...}], no "value" = remove
+            await conn.execute("""
+                CREATE OR REPLACE FUNCTION ludo_doc_patch(doc JSONB, changes JSONB) RETURNS JSONB AS $$
+                DECLARE
+                    change JSONB;
+                    path TEXT[];
+                BEGIN
+                    FOR change IN SELECT * FROM jsonb_array_elements(changes) LOOP
+                        path := ARRAY(SELECT jsonb_array_elements_text(change->'path'));
+                        IF change ? 'value' THEN
+                            doc := jsonb_set(doc, path, change->'value');
+                        ELSE
+                            doc := doc #- path;
+                        END IF;
+                    END LOOP;
+                    RETURN doc;
+                END;
+                $$ LANGUAGE plpgsql IMMUTABLE
+            """)
+            await conn.execute("ALTER TABLE games ADD COLUMN IF NOT EXISTS version INTEGER NOT NULL DEFAULT 0")
+            await conn.execute(POSITIONS_SCHEMA)
+            await conn.execute(HISTORY_SCHEMA)
+            await conn.execute(GAME_FUNCTIONS)
+        await self.warm_pool()
+        await self.load_file_ids()
+        await self.listen()
 
     async def create_game(self, chat_id, team_mode=False):
         async with self.pool.acquire() as conn:
-            return await conn.fetchval(
+            game_id = await conn.fetchval(
                 "INSERT INTO games (chat_id, team_mode) VALUES ($1, $2) ON CONFLICT (chat_id) DO UPDATE SET status='LOBBY' RETURNING id",
                 chat_id, team_mode
             )
+        self.game_cache.pop(chat_id)
+        return game_id
 
     async def get_game(self, chat_id):
+        game = self.cached_game(chat_id)
+        if game is not None:
+            return game
         async with self.pool.acquire() as conn:
-            # Optimized: Fetch game, players, and tokens in a single request using JSON aggregation
-            row = await conn.fetchrow("""
-                SELECT g.*, 
-                    (SELECT jsonb_agg(p_data)
-                     FROM (
-                         SELECT p.*, 
-                            (SELECT jsonb_agg(t_data)
-                             FROM (
-                                 SELECT * FROM tokens t WHERE t.player_id = p.id ORDER BY t.token_index
-                             ) t_data) as tokens
-                         FROM players p
-                         WHERE p.game_id = g.id
-                         ORDER BY p.color
-                     ) p_data) as players
-                FROM games g
-                WHERE g.chat_id = $1
-            """, chat_id)
-            
-            if not row:
-                return None
-            
-            game_dict = dict(row)
-            # asyncpg returns the result of jsonb_agg as a list of dicts (or string depending on driver config/type)
-            # By default with asyncpg and jsonb, it returns list of dicts.
-            if game_dict['players'] is None:
-                game_dict['players'] = []
-            else:
-                # Ensure nested items are also converted/handled if needed
-                # Actually asyncpg's jsonb_agg already returns them as Python objects.
-                pass
-                
-            return game_dict
+            # Game, players and tokens as one jsonb document (same shape the commands return)
+            game = decode_json(await conn.fetchval(HOT_QUERIES['game'], chat_id))
+        return self.cache_game(game)
+
+    async def roll(self, chat_id, user_id, value, version=None):
+        """
+        Applies a dice roll for `user_id` in one transaction. Returns a dict with
+        'result' (rolled, three_sixes, no_moves or a rejection: not_found,
+        stale, not_active, not_turn, already_rolled) and, when applied,
+        'player' (the roller) and 'game' (the new state). `version` is the game
+        version the click was made against; None accepts the current one.
+        """
+        async with self.pool.acquire() as conn:
+            outcome = decode_json(await conn.fetchval(HOT_QUERIES['roll'], chat_id, user_id, value, version))
+        return self._cache_outcome(outcome)
+
+    async def move(self, chat_id, user_id, token_index, version=None):
+        """
+        Moves a token, resets killed tokens and advances the turn in one
+        transaction. 'result' is moved, won or team_won (with 'winner_team'),
+        or a rejection: not_found, stale, not_active, not_turn, not_rolled, invalid.
+        """
+        async with self.pool.acquire() as conn:
+            outcome = decode_json(await conn.fetchval(HOT_QUERIES['move'], chat_id, user_id, token_index, version))
+        return self._cache_outcome(outcome)
+
+    async def skip(self, chat_id, user_id, version=None):
+        """Passes the turn of `user_id` in one transaction. 'result' is skipped or a rejection."""
+        async with self.pool.acquire() as conn:
+            outcome = decode_json(await conn.fetchval(HOT_QUERIES['skip'], chat_id, user_id, version))
+        return self._cache_outcome(outcome)
 
     async def add_player(self, game_id, user_id, username, color, team_id=None):
         async with self.pool.acquire() as conn:
-            async with conn.transaction():
-                player_id = await conn.fetchval(
-                    "INSERT INTO players (game_id, user_id, username, color, team_id) VALUES ($1, $2, $3, $4, $5) RETURNING id",
-                    game_id, user_id, username, color, team_id
+            # Player row plus their four tokens back in base, in one statement.
+            # The games UPDATE bumps the version, so other instances drop their cached lobby.
+            row = await conn.fetchrow("""
+                WITH p AS (
+                    INSERT INTO players (game_id, user_id, username, color, team_id) VALUES ($1, $2, $3, $4, $5) RETURNING id
                 )
-                for i in range(4):
-                    await conn.execute(
-                        "INSERT INTO tokens (player_id, token_index) VALUES ($1, $2)",
-                        player_id, i
-                    )
-                return player_id
-
-    async def update_token(self, token_id, position, is_finished=False):
-        async with self.pool.acquire() as conn:
-            await conn.execute(
-                "UPDATE tokens SET position = $1, is_finished = $2 WHERE id = $3",
-                position, is_finished, token_id
+                UPDATE games SET positions[$4 * 4 + 1 : $4 * 4 + 4] = '{-1,-1,-1,-1}'
+                WHERE id = $1
+                RETURNING chat_id, (SELECT id FROM p) AS player_id
+            """, game_id, user_id, username, color, team_id)
+        self.game_cache.pop(row['chat_id'])
+        return row['player_id']
+
+    async def update_token(self, game_id, color, token_index, position):
+        async with self.pool.acquire() as conn:
+            chat_id = await conn.fetchval(
+                "UPDATE games SET positions[$2 * 4 + $3 + 1] = $4 WHERE id = $1 RETURNING chat_id",
+                game_id, color, token_index, position
             )
+        self.game_cache.pop(chat_id)
 
     async def update_game_state(self, game_id, **kwargs):
         if not kwargs: return
         async with self.pool.acquire() as conn:
             cols = ", ".join([f"{k} = ${i+2}" for i, k in enumerate(kwargs.keys())])
             vals = list(kwargs.values())
-            await conn.execute(f"UPDATE games SET {cols} WHERE id = $1", game_id, *vals)
+            chat_id = await conn.fetchval(f"UPDATE games SET {cols} WHERE id = $1 RETURNING chat_id", game_id, *vals)
+        self.game_cache.pop(chat_id)
 
     async def update_user_stats(self, user_id, username, won=False):
         async with self.pool.acquire() as conn:
@@ -152,14 +774,203 @@ class LudoDB:
                     wins = users.wins + $3,
                     credits = users.credits + $4
             """, user_id, username, win_inc, credit_inc)
+        self.stats_cache.pop(user_id)
+
+    async def settle_game(self, game_id, results):
+        """
+        Scores a FINISHED game and deletes it in one statement, so every
+        player's stats and the close commit together or not at all.
+        `results` is a list of (user_id, username, won). Running it again
+        after a commit is a no-op: the game row is already gone.
+        """
+        user_ids = [r[0] for r in results]
+        async with self.pool.acquire() as conn:
+            chat_id = await conn.fetchval("""
+                WITH closed AS (
+                    DELETE FROM games WHERE id = $1 AND status = 'FINISHED' RETURNING chat_id
+                ), scored AS (
+                    INSERT INTO users (user_id, username, matches, wins, credits)
+                    SELECT s.user_id, s.username, 1, s.won::int, CASE WHEN s.won THEN 100 ELSE 10 END
+                    FROM unnest($2::bigint[], $3::text[], $4::boolean[]) AS s(user_id, username, won)
+                    WHERE EXISTS (SELECT 1 FROM closed)
+                    ON CONFLICT (user_id) DO UPDATE SET
+                        username = EXCLUDED.username,
+                        matches = users.matches + 1,
+                        wins = users.wins + EXCLUDED.wins,
+                        credits = users.credits + EXCLUDED.credits
+                )
+                SELECT chat_id FROM closed
+            """, game_id, user_ids, [r[1] for r in results], [r[2] for r in results])
+        for user_id in user_ids:
+            self.stats_cache.pop(user_id)
+        if chat_id is not None:
+            self.game_cache.pop(chat_id)
+        return chat_id
+
+    async def get_finished_games(self):
+        """FINISHED games still waiting on settlement (e.g. the process died before it committed)."""
+        async with self.pool.acquire() as conn:
+            rows = await conn.fetch("SELECT ludo_game_state(chat_id) AS game FROM games WHERE status = 'FINISHED'")
+        return [decode_json(row['game']) for row in rows]
+
+    async def get_game_events(self, game_id):
+        """The move log of a game (live or finished), oldest first."""
+        async with self.pool.acquire() as conn:
+            rows = await conn.fetch("SELECT * FROM game_events WHERE game_id = $1 ORDER BY seq", game_id)
+        return [dict(row) for row in rows]
+
+    async def replay_game(self, game_id, seq=None):
+        """Head state of a game as of version `seq` (default: latest), or None if it has no history."""
+        async with self.pool.acquire() as conn:
+            return decode_json(await conn.fetchval("SELECT ludo_replay($1, $2)", game_id, seq))
 
     async def get_user_stats(self, user_id):
+        stats = self.stats_cache.get(user_id)
+        if stats is None:
+            async with self.pool.acquire() as conn:
+                row = await conn.fetchrow(f"SELECT u.*, {RANK_SQL} AS rank FROM users u WHERE u.user_id = $1", user_id)
+            if not row: return None
+            stats = dict(row)
+            self.stats_cache.put(user_id, stats)
+        return stats
+
+    async def get_leaderboard(self, after=None, limit=LEADERBOARD_PAGE_SIZE):
+        """
+        One page of the global leaderboard, ordered by wins then user_id.
+        `after` is the (wins, user_id) of the last row of the previous page
+        (keyset pagination: every page is an index range scan, however deep).
+        """
+        page = self.leaderboard_cache.get(after)
+        if page is None:
+            columns = f"u.user_id, u.username, u.wins, u.matches, {RANK_SQL} AS rank"
+            async with self.pool.acquire() as conn:
+                if after is None:
+                    rows = await conn.fetch(f"""
+                        SELECT {columns} FROM users u ORDER BY u.wins DESC, u.user_id LIMIT $1
+                    """, limit)
+                else:
+                    rows = await conn.fetch(f"""
+                        SELECT {columns} FROM users u
+                        WHERE u.wins <= $1 AND (u.wins < $1 OR u.user_id > $2)
+                        ORDER BY u.wins DESC, u.user_id LIMIT $3
+                    """, after[0], after[1], limit)
+            page = [dict(row) for row in rows]
+            self.leaderboard_cache.put(after, page)
+        return page
+
+    async def _load_doc(self, table, key_col, key):
+        async with self.pool.acquire() as conn:
+            row = await conn.fetchrow(f"SELECT doc, rev FROM {table} WHERE {key_col} = $1", key)
+        if row is None:
+            self.state_docs.pop((table, key))
+            return None
+        doc = decode_json(row['doc'])
+        # The baseline is a private copy: callers mutate what they get (from_dict keeps lists)
+        self.state_docs.put((table, key), (row['rev'], copy.deepcopy(doc)))
+        return doc
+
+    async def _save_doc(self, table, key_col, key, doc):
+        """
+        Writes only the paths that differ from the last copy this instance
+        read or wrote (ludo_doc_patch, see _doc_changes). Falls back to the
+        whole document when there is no baseline, the row has gone, or another
+        instance wrote it since (its rev moved on); that write is then
+        last-writer-wins, as before, rather than a patch on a stale diff.
+        """
+        base = self.state_docs.get((table, key))
+        rev = None
+        async with self.pool.acquire() as conn:
+            if base is not None:
+                changes = _doc_changes(base[1], doc)
+                if not changes:
+                    return
+                rev = await conn.fetchval(f"""
+                    UPDATE {table} SET doc = ludo_doc_patch(doc, $2::jsonb), rev = rev + 1, updated_at = CURRENT_TIMESTAMP
+                    WHERE {key_col} = $1 AND rev = $3 RETURNING rev
+                """, key, changes, base[0])
+            if rev is None:
+                rev = await conn.fetchval(f"""
+                    INSERT INTO {table} ({key_col}, doc) VALUES ($1, $2)
+                    ON CONFLICT ({key_col}) DO UPDATE SET doc = EXCLUDED.doc, rev = {table}.rev + 1, updated_at = CURRENT_TIMESTAMP
+                    RETURNING rev
+                """, key, doc)
+        self.state_docs.put((table, key), (rev, copy.deepcopy(doc)))
+
+    async def get_game_state(self, chat_id):
+        return await self._load_doc('game_states', 'chat_id', chat_id)
+
+    async def save_game_state(self, chat_id, state):
+        await self._save_doc('game_states', 'chat_id', chat_id, state)
+
+    async def delete_game_state(self, chat_id):
         async with self.pool.acquire() as conn:
-            row = await conn.fetchrow("SELECT *, (SELECT COUNT(*) + 1 FROM users u WHERE u.wins > users.wins) as rank FROM users WHERE user_id = $1", user_id)
-            return dict(row) if row else None
+            await conn.execute("DELETE FROM game_states WHERE chat_id = $1", chat_id)
+        self.state_docs.pop(('game_states', chat_id))
+
+    async def get_tournament_state(self, tournament_id):
+        return await self._load_doc('tournament_states', 'tournament_id', tournament_id)
+
+    async def save_tournament_state(self, tournament_id, state):
+        await self._save_doc('tournament_states', 'tournament_id', tournament_id, state)
+
+    async def update_player_game_end(self, user_id, username, rank):
+        """Stats for a ludo.manager game: rank 1 is the winner."""
+        await self.update_user_stats(user_id, username, won=rank == 1)
+
+    async def get_chat_settings(self, chat_id):
+        settings = self.settings_cache.get(chat_id)
+        if settings is None:
+            async with self.pool.acquire() as conn:
+                row = await conn.fetchrow(HOT_QUERIES['settings'], chat_id)
+            settings = dict(row) if row else {'render_profile': None, 'lite_mode': False}
+            self.settings_cache.put(chat_id, settings)
+        return settings
+
+    async def get_render_profile(self, chat_id):
+        return (await self.get_chat_settings(chat_id))['render_profile']
+
+    async def set_render_profile(self, chat_id, profile):
+        async with self.pool.acquire() as conn:
+            await conn.execute("""
+                INSERT INTO chat_settings (chat_id, render_profile) VALUES ($1, $2)
+                ON CONFLICT (chat_id) DO UPDATE SET render_profile = EXCLUDED.render_profile
+            """, chat_id, profile)
+        self.settings_cache.pop(chat_id)
+
+    async def set_lite_mode(self, chat_id, enabled):
+        async with self.pool.acquire() as conn:
+            await conn.execute("""
+                INSERT INTO chat_settings (chat_id, lite_mode) VALUES ($1, $2)
+                ON CONFLICT (chat_id) DO UPDATE SET lite_mode = EXCLUDED.lite_mode
+            """, chat_id, enabled)
+        self.settings_cache.pop(chat_id)
+
+    async def load_file_ids(self):
+        """Warms the file_id LRU with the most recently used entries after a restart."""
+        async with self.pool.acquire() as conn:
+            rows = await conn.fetch("""
+                SELECT content_hash, file_id FROM (
+                    SELECT * FROM media_cache ORDER BY used_at DESC LIMIT $1
+                ) recent ORDER BY used_at ASC
+            """, FILE_ID_CACHE_SIZE)
+        for row in rows:
+            self.file_id_cache.put(row['content_hash'], row['file_id'])
+
+    def cached_file_id(self, content_hash):
+        # Memory only: a miss means upload, so a DB lookup here would just add latency
+        return self.file_id_cache.get(content_hash)
+
+    async def save_file_id(self, content_hash, file_id):
+        self.file_id_cache.put(content_hash, file_id)
+        async with self.pool.acquire() as conn:
+            await conn.execute("""
+                INSERT INTO media_cache (content_hash, file_id) VALUES ($1, $2)
+                ON CONFLICT (content_hash) DO UPDATE SET file_id = EXCLUDED.file_id, used_at = CURRENT_TIMESTAMP
+            """, content_hash, file_id)
 
     async def close_game(self, chat_id):
         async with self.pool.acquire() as conn:
             await conn.execute("DELETE FROM games WHERE chat_id = $1", chat_id)
+        self.game_cache.pop(chat_id)
 
 db = LudoDB()
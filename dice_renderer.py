@@ -1,17 +1,19 @@
 from PIL import Image, ImageDraw
 import io
+import random
+from assets import asset_pack
 
-def generate_dice_frame(value):
-    """Generates a high-quality dice face image."""
+def draw_dice_face(value):
+    """Draws a high-quality dice face as an RGBA image."""
     size = 200
     img = Image.new('RGBA', (size, size), (255, 255, 255, 0))
     draw = ImageDraw.Draw(img)
-    
+
     # Shadow
     draw.rounded_rectangle([10, 15, 190, 195], radius=30, fill=(0, 0, 0, 40))
     # Base
     draw.rounded_rectangle([10, 10, 190, 190], radius=30, fill=(255, 255, 255), outline=(200, 200, 200))
-    
+
     dot_radius = 15
     dots = {
         1: [(100, 100)],
@@ -21,12 +23,87 @@ def generate_dice_frame(value):
         5: [(60, 60), (140, 60), (100, 100), (60, 140), (140, 140)],
         6: [(60, 60), (140, 60), (60, 100), (140, 100), (60, 140), (140, 140)]
     }
-    
+
     for dot_pos in dots.get(value, []):
         x, y = dot_pos
         draw.ellipse([x-dot_radius, y-dot_radius, x+dot_radius, y+dot_radius], fill=(0, 0, 0))
-        
+    return img
+
+def encode_png(img):
     buf = io.BytesIO()
     img.save(buf, format='PNG')
-    buf.seek(0)
+    return buf.getvalue()
+
+# Roll animation: tumbling random faces that settle on the final value
+ROLL_FRAMES = 8
+ROLL_FRAME_MS = 70
+ROLL_HOLD_MS = 1200
+ROLL_SIZE = 260
+
+def build_roll_animation(faces, value):
+    """Encodes the roll animation ending on `value` as a GIF (deterministic per value)."""
+    rng = random.Random(value)
+    frames = []
+    for i in range(ROLL_FRAMES):
+        face = faces[rng.choice([v for v in range(1, 7) if v != value])]
+        angle = rng.choice([-1, 1]) * (ROLL_FRAMES - i) * 9
+        frames.append(face.rotate(angle, resample=Image.BILINEAR, expand=True))
+    frames.append(faces[value])
+
+    # GIF has no partial alpha, so flatten onto white. The padding keeps
+    # rotated corners inside the frame.
+    flat = []
+    for frame in frames:
+        bg = Image.new('RGB', (ROLL_SIZE, ROLL_SIZE), (255, 255, 255))
+        w, h = frame.size
+        bg.paste(frame, ((ROLL_SIZE - w) // 2, (ROLL_SIZE - h) // 2), frame)
+        flat.append(bg)
+    buf = io.BytesIO()
+    flat[0].save(
+        buf, format='GIF', save_all=True, append_images=flat[1:],
+        duration=[ROLL_FRAME_MS] * ROLL_FRAMES + [ROLL_HOLD_MS], loop=0
+    )
+    return buf.getvalue()
+
+# Built once (or mapped from the asset pack) and never mutated
+ASSETS = asset_pack()
+DICE_FACE_IMAGES = {v: ASSETS.get(f"dice/{v}") or draw_dice_face(v) for v in range(1, 7)}
+DICE_FACES = {
+    v: bytes(ASSETS[f"dice/{v}.png"]) if f"dice/{v}.png" in ASSETS else encode_png(img)
+    for v, img in DICE_FACE_IMAGES.items()
+}
+DICE_ANIMATIONS = {
+    v: bytes(ASSETS[f"dice/{v}.gif"]) if f"dice/{v}.gif" in ASSETS else build_roll_animation(DICE_FACE_IMAGES, v)
+    for v in range(1, 7)
+}
+
+def baked_assets():
+    """Dice entries for the asset pack: raw faces plus their encoded PNG/GIF bytes."""
+    entries = {}
+    for v in range(1, 7):
+        entries[f"dice/{v}"] = DICE_FACE_IMAGES[v]
+        entries[f"dice/{v}.png"] = DICE_FACES[v]
+        entries[f"dice/{v}.gif"] = DICE_ANIMATIONS[v]
+    return entries
+
+# Telegram file_id of each uploaded animation, so later rolls skip the upload
+DICE_FILE_IDS = {}
+
+def generate_dice_frame(value):
+    """Returns the dice face PNG for `value` as a fresh buffer."""
+    data = DICE_FACES.get(value)
+    if data is None:
+        data = encode_png(draw_dice_face(value))
+    return io.BytesIO(data)
+
+def dice_animation(value):
+    """Telegram file_id of the roll animation if already uploaded, otherwise the GIF bytes."""
+    file_id = DICE_FILE_IDS.get(value)
+    if file_id:
+        return file_id
+    buf = io.BytesIO(DICE_ANIMATIONS[value])
+    buf.name = f"dice_{value}.gif"
     return buf
+
+def remember_dice_file_id(value, file_id):
+    DICE_FILE_IDS[value] = file_id
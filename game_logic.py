@@ -1,4 +1,10 @@
-from team_logic import can_kill, is_teammate, check_team_victory
+from team_logic import can_kill, is_teammate, check_team_victory, game_positions
+from coordinate_system import SAFE_ZONE_INDICES
+from rules_core import FINISHED, make_geometry, build_occupancy, killed_slots
+
+# Indexed by color: Red, Green, Yellow, Blue
+START_POSITIONS = (23, 36, 49, 10)
+ENTRANCE_POSITIONS = (25, 38, 51, 12)
 
 def get_start_position(color):
     """
@@ -9,60 +15,43 @@ def get_start_position(color):
     - Yellow (2): Top-right quadrant → starts at index 49 (grid 8, 1)
     - Blue (3): Top-left quadrant → starts at index 10 (grid 1, 6)
     """
-    return {0: 23, 1: 36, 2: 49, 3: 10}[color]
+    return START_POSITIONS[color]
 
 def get_entrance_position(color):
     """
     Returns the position index (on the 52-step path) where a token turns into home.
     Matches the arrow positions in the image: Blue:12, Red:25, Green:38, Yellow:51.
     """
-    return {0: 25, 1: 38, 2: 51, 3: 12}[color]
+    return ENTRANCE_POSITIONS[color]
+
+# The DB engine's geometry: absolute start squares, a 6-square home stretch
+DB_GEOMETRY = make_geometry(START_POSITIONS, ENTRANCE_POSITIONS, 6, SAFE_ZONE_INDICES)
+
+def compute_move(color, current_pos, dice_value):
+    """One move by the rules core: (new_pos, finished). An illegal move leaves the token where it is."""
+    new_pos = DB_GEOMETRY.moves[color][current_pos + 1][dice_value - 1]
+    return new_pos, new_pos == FINISHED and current_pos != FINISHED
+
+# TRANSITIONS[color][position + 1][dice - 1] -> (new_pos, finished, legal) for
+# every position -1..99 (58-98 are never held and are always illegal).
+def _transition(color, pos, dice):
+    new_pos, finished = compute_move(color, pos, dice)
+    return new_pos, finished, new_pos != pos
+
+TRANSITIONS = tuple(
+    tuple(tuple(_transition(color, pos, dice) for dice in range(1, 7)) for pos in range(-1, 100))
+    for color in range(4)
+)
 
 def move_token(player, token_idx, dice_value):
-    token = player['tokens'][token_idx]
-    current_pos = token['position']
-    color = player['color']
-    
-    if current_pos == -1:
-        if dice_value == 6:
-            return get_start_position(color), False
-        return -1, False
-    
-    if current_pos == 99:
-        return 99, False
-    
-    if 0 <= current_pos <= 51:
-        # Calculate steps remaining on main path
-        # In Ludo, you exit main path at the threshold.
-        # Thresholds: B:11, R:24, G:37, Y:50
-        threshold = get_entrance_position(color)
-        
-        # Steps from current to threshold (clockwise)
-        if current_pos <= threshold:
-            steps_to_threshold = threshold - current_pos
-        else:
-            steps_to_threshold = (52 - current_pos) + threshold
-            
-        if dice_value <= steps_to_threshold:
-            return (current_pos + dice_value) % 52, False
-        else:
-            # Entering home stretch
-            steps_into_home = dice_value - steps_to_threshold
-            # Home path starts at 52 (index 0 of home stretch)
-            new_pos = 51 + steps_into_home 
-            if new_pos > 57:
-                if new_pos == 58: return 99, True # Exactly finished
-                return current_pos, False # Too high
-            return new_pos, False
-            
-    if 52 <= current_pos <= 57:
-        new_pos = current_pos + dice_value
-        if new_pos > 57:
-            if new_pos == 58: return 99, True
-            return current_pos, False
-        return new_pos, False
-        
-    return current_pos, False
+    new_pos, finished, _ = TRANSITIONS[player['color']][player['tokens'][token_idx]['position'] + 1][dice_value - 1]
+    return new_pos, finished
+
+def valid_moves(player, dice_value):
+    """Indices of the player's tokens that can move `dice_value` squares."""
+    rows = TRANSITIONS[player['color']]
+    d = dice_value - 1
+    return [t_idx for t_idx, token in enumerate(player['tokens']) if rows[token['position'] + 1][d][2]]
 
 def get_killing_impact(game, attacker_color, new_pos):
     """
@@ -72,19 +61,9 @@ def get_killing_impact(game, attacker_color, new_pos):
     if new_pos < 0 or new_pos > 51: return [] # Home stretch/base is safe
     
     # Safe zones (stars)
-    from coordinate_system import SAFE_ZONE_INDICES
-    if new_pos in SAFE_ZONE_INDICES: return []
+    if DB_GEOMETRY.safe >> new_pos & 1: return []
     
-    to_reset = []
-    for p_idx, player in enumerate(game['players']):
-        if player['color'] == attacker_color: continue
-        
-        # Check team logic
-        if game.get('team_mode') and is_teammate(attacker_color, player['color']):
-            continue
-            
-        for t_idx, token in enumerate(player['tokens']):
-            if token['position'] == new_pos:
-                to_reset.append((p_idx, t_idx))
-                
-    return to_reset
+    occupancy = build_occupancy(game_positions(game))
+    slots = killed_slots(DB_GEOMETRY, occupancy, attacker_color, new_pos, game.get('team_mode'))
+    player_idx = {player['color']: p_idx for p_idx, player in enumerate(game['players'])}
+    return sorted((player_idx[slot >> 2], slot & 3) for slot in slots)
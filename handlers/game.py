@@ -1,23 +1,28 @@
 import random
 import asyncio
+import hashlib
 from pyrogram import types
+from pyrogram.errors import MessageNotModified
 from db import db
-from board_renderer import render_board
-from dice_renderer import generate_dice_frame
-from game_logic import move_token, get_killing_impact
+from render_service import render_service, RenderOverloaded
+from ludo.render import render_lite_board
+from dice_renderer import dice_animation, remember_dice_file_id
+from game_logic import valid_moves
 from team_logic import check_team_victory
 from config import COLORS
 
-async def send_board(client, chat_id, message_id=None):
+async def send_board(client, chat_id, message_id=None, game=None):
+    """Sends or edits the board. Pass `game` when a command already returned the new state."""
     try:
-        game = await db.get_game(chat_id)
+        if game is None:
+            game = await db.get_game(chat_id)
         if not game: return
         
         # Validate game is still active
         if game['status'] != 'PLAYING':
             return
         
-        img_buf = render_board(game)
+        settings = await db.get_chat_settings(chat_id)
         curr_player = game['players'][game['current_turn_index']]
         
         caption = f"**Ludo Game**\nTurn: {COLORS[curr_player['color']]} @{curr_player['username']}\n"
@@ -25,44 +30,69 @@ async def send_board(client, chat_id, message_id=None):
             caption += f"Dice: 🎲 {game['dice_value']}"
             
         keyboard = []
+        # Buttons carry the game version they were built from, so clicks on an
+        # outdated board are rejected without touching the database
+        version = game['version']
         # If dice not rolled
         if game['dice_value'] == 0:
-            keyboard.append([types.InlineKeyboardButton("🎲 Roll Dice", callback_data="roll")])
+            keyboard.append([types.InlineKeyboardButton("🎲 Roll Dice", callback_data=f"roll:{version}")])
             keyboard.append([types.InlineKeyboardButton("🛑 Stop Game", callback_data="stop")])
         else:
-            # Move buttons for available tokens
-            row = []
-            for i, t in enumerate(curr_player['tokens']):
-                if t['position'] == 99: continue
-                # Basic validation: can move or need 6 to exit
-                if t['position'] == -1 and game['dice_value'] != 6: continue
-                
-                row.append(types.InlineKeyboardButton(f"Token {i+1}", callback_data=f"move_{i}"))
+            # Move buttons only for tokens that have a legal move
+            row = [
+                types.InlineKeyboardButton(f"Token {i+1}", callback_data=f"move_{i}:{version}")
+                for i in valid_moves(curr_player, game['dice_value'])
+            ]
             
             if row:
                 keyboard.append(row)
             else:
-                keyboard.append([types.InlineKeyboardButton("Skip Turn (No Moves)", callback_data="skip")])
+                keyboard.append([types.InlineKeyboardButton("Skip Turn (No Moves)", callback_data=f"skip:{version}")])
             
             keyboard.append([types.InlineKeyboardButton("🛑 Stop Game", callback_data="stop")])
 
         reply_markup = types.InlineKeyboardMarkup(keyboard)
         
+        if settings['lite_mode']:
+            return await send_text_board(client, game, caption, reply_markup, message_id)
+        try:
+            img_buf = await render_service.render(game, settings['render_profile'])
+        except RenderOverloaded:
+            # Image workers are saturated: a text board keeps the game moving with no Pillow work
+            return await send_text_board(client, game, caption, reply_markup, message_id)
+        
+        # Identical images (e.g. the opening board) are sent by Telegram file_id, not re-uploaded
+        content_hash = hashlib.blake2b(img_buf.getvalue(), digest_size=16).hexdigest()
+        file_id = db.cached_file_id(content_hash)
+        
+        sent = None
+        uploaded = not file_id # A cached file_id sends no bytes; only real uploads are worth saving
         if message_id:
             try:
-                await client.edit_message_media(
+                sent = await client.edit_message_media(
                     chat_id, message_id,
-                    media=types.InputMediaPhoto(img_buf, caption=caption),
+                    media=types.InputMediaPhoto(file_id or img_buf, caption=caption),
                     reply_markup=reply_markup
                 )
             except Exception as e:
-                # Fallback if edit fails (e.g. same content or deleted message)
+                # Fallback if edit fails (e.g. same content, deleted message or expired file_id)
                 try:
-                    await client.send_photo(chat_id, photo=img_buf, caption=caption, reply_markup=reply_markup)
+                    img_buf.seek(0)
+                    sent = await client.send_photo(chat_id, photo=img_buf, caption=caption, reply_markup=reply_markup)
+                    uploaded = True
                 except:
                     pass
         else:
-            await client.send_photo(chat_id, photo=img_buf, caption=caption, reply_markup=reply_markup)
+            try:
+                sent = await client.send_photo(chat_id, photo=file_id or img_buf, caption=caption, reply_markup=reply_markup)
+            except Exception as e:
+                if not file_id: raise
+                img_buf.seek(0)
+                sent = await client.send_photo(chat_id, photo=img_buf, caption=caption, reply_markup=reply_markup)
+                uploaded = True
+        
+        if uploaded and sent and sent.photo:
+            await db.save_file_id(content_hash, sent.photo.file_id)
     except Exception as e:
         # Critical error - notify users
         try:
@@ -70,148 +100,180 @@ async def send_board(client, chat_id, message_id=None):
         except:
             pass
 
-async def roll_handler(client, callback_query):
+async def send_text_board(client, game, caption, reply_markup, message_id=None):
+    """Lite mode: the emoji board as a text message, edited in place when possible."""
+    chat_id = game['chat_id']
+    text = f"{render_lite_board(game)}\n\n{caption}"
+    if message_id:
+        try:
+            return await client.edit_message_text(chat_id, message_id, text, reply_markup=reply_markup)
+        except MessageNotModified:
+            return
+        except Exception as e:
+            pass # Photo board (mode just switched) or deleted message: send a fresh one
+    await client.send_message(chat_id, text, reply_markup=reply_markup)
+
+# Answers for commands the database rejected: result -> (text, show_alert)
+REJECTIONS = {
+    'not_found': ("Game not found!", True),
+    'stale': ("This board is out of date, use the latest one.", False),
+    'not_active': ("Game is not active!", True),
+    'not_turn': ("It's not your turn!", True),
+    'already_rolled': ("Dice already rolled!", False),
+    'not_rolled': ("Roll the dice first!", False),
+    'invalid': ("Invalid move for this token.", False),
+}
+
+async def answer_rejection(callback_query, result):
+    text, show_alert = REJECTIONS[result]
+    await callback_query.answer(text, show_alert=show_alert)
+
+def callback_version(data):
+    """'roll:12' -> 12. Buttons sent before versioning carry none."""
+    _, _, version = data.partition(':')
+    return int(version) if version else None
+
+def cached_rejection(chat_id, user_id, command, version=None, token_idx=None):
+    """
+    Rejects clicks that the cached game already rules out (stale board, wrong
+    player, dice state) without a database round trip. The server-side
+    command re-validates everything it accepts.
+    """
+    game = db.cached_game(chat_id)
+    if not game: return None
+    if version is not None and version != game['version']:
+        if version < game['version']: return 'stale'
+        # The button is newer than the cache (a missed notification): drop the entry, let the server decide
+        db.evict_game(chat_id)
+        return None
+    if game['status'] != 'PLAYING': return None
+    if game['players'][game['current_turn_index']]['user_id'] != user_id: return 'not_turn'
+    if command == 'roll' and game['dice_value'] != 0: return 'already_rolled'
+    if command == 'move':
+        if game['dice_value'] <= 0: return 'not_rolled'
+        if token_idx not in valid_moves(game['players'][game['current_turn_index']], game['dice_value']): return 'invalid'
+    return None
+
+async def roll_handler(client, callback_query, version=None):
     chat_id = callback_query.message.chat.id
     
     try:
-        game = await db.get_game(chat_id)
-        if not game:
-            return await callback_query.answer("Game not found!")
-            
-        curr_player = game['players'][game['current_turn_index']]
-        if callback_query.from_user.id != curr_player['user_id']:
-            return await callback_query.answer("It's not your turn!", show_alert=True)
-            
-        if game['dice_value'] != 0:
-            return await callback_query.answer("Dice already rolled!")
-
-        # IMMEDIATE LOCK: prevented duplicate rolls by setting a temp rolling state in DB
-        await db.update_game_state(game['id'], dice_value=-1)
-        
-        # Immediate feedback to the user
-        await callback_query.answer("🎲 Rolling...")
-
-        # Skip multi-frame animation to avoid FloodWait and lag.
-        # The 'Rolling...' answer above provides sufficient immediate feedback.
+        rejection = cached_rejection(chat_id, callback_query.from_user.id, 'roll', version)
+        if rejection:
+            return await answer_rejection(callback_query, rejection)
         
+        # Validation, the three-6s rule and the no-moves skip all happen in one
+        # locked transaction, so two fast clicks can never both roll.
         real_val = random.randint(1, 6)
+        outcome = await db.roll(chat_id, callback_query.from_user.id, real_val, version)
+        result = outcome['result']
+        if result in REJECTIONS:
+            return await answer_rejection(callback_query, result)
         
-        # Track consecutive 6s
-        consecutive_sixes = game.get('consecutive_sixes', 0)
-        if real_val == 6:
-            consecutive_sixes += 1
-        else:
-            consecutive_sixes = 0
+        # Immediate feedback to the user
+        await callback_query.answer("🎲 Rolling...")
+        username = outcome['player']['username']
         
-        await db.update_game_state(game['id'], dice_value=real_val, consecutive_sixes=consecutive_sixes)
+        # Roll animation: one pre-rendered GIF per value, uploaded once and then
+        # re-sent by file_id, so a roll costs no rendering and no upload.
+        try:
+            dice_msg = await callback_query.message.reply_animation(dice_animation(real_val))
+            if dice_msg and dice_msg.animation:
+                remember_dice_file_id(real_val, dice_msg.animation.file_id)
+        except Exception as e:
+            print(f"Dice Animation Error: {e}")
         
         # Three 6s Rule: Turn immediately ends after third consecutive 6
-        if consecutive_sixes >= 3:
-            await callback_query.message.reply(f"🚫 @{curr_player['username']} rolled 3 consecutive 6s! Turn skipped.")
-            await db.update_game_state(game['id'], consecutive_sixes=0)
-            await skip_turn(game)
-            return await send_board(client, chat_id, callback_query.message.id)
-        
-        # Check if any moves possible
-        any_possible = False
-        for t in curr_player['tokens']:
-            if t['position'] == -1 and real_val == 6: 
-                any_possible = True
-            elif 0 <= t['position'] <= 51:
-                any_possible = True
-            elif 52 <= t['position'] <= 57:
-                if t['position'] + real_val <= 58:
-                    any_possible = True
-                
-        if not any_possible:
-            await callback_query.message.reply(f"😅 @{curr_player['username']} rolled {real_val}, but no moves are possible!")
-            await db.update_game_state(game['id'], consecutive_sixes=0)
-            await skip_turn(game)
+        if result == 'three_sixes':
+            await callback_query.message.reply(f"🚫 @{username} rolled 3 consecutive 6s! Turn skipped.")
+        elif result == 'no_moves':
+            await callback_query.message.reply(f"😅 @{username} rolled {real_val}, but no moves are possible!")
             
-        await send_board(client, chat_id, callback_query.message.id)
+        await send_board(client, chat_id, callback_query.message.id, game=outcome['game'])
 
     except Exception as e:
-        # Emergency reset of state if something fails during the process
         try:
-            game = await db.get_game(chat_id)
-            if game and game['dice_value'] == -1:
-                await db.update_game_state(game['id'], dice_value=0)
             await callback_query.answer("⚠️ Roll failed. Please try again.", show_alert=True)
             print(f"Roll Error: {e}")
         except:
             pass
 
-async def move_handler(client, callback_query, token_idx):
+SETTLE_ATTEMPTS = 5
+_settlements = {} # game id -> pending settlement task (a strong reference, so it is not garbage collected)
+
+async def settle_game(game, results):
+    """Writes the final stats and closes the game, retrying with backoff on failure."""
+    for attempt in range(SETTLE_ATTEMPTS):
+        try:
+            await db.settle_game(game['id'], results)
+            break
+        except Exception as e:
+            print(f"Settlement Error (game {game['id']}, attempt {attempt + 1}): {e}")
+            if attempt + 1 < SETTLE_ATTEMPTS:
+                await asyncio.sleep(2 ** attempt)
+    render_service.forget_chat(game['chat_id'])
+
+def start_settlement(game, results):
+    """
+    Settles a finished game in the background: the winner announcement has
+    already gone out, so the last click does not wait on the stats writes.
+    """
+    if game['id'] in _settlements: return
+    task = asyncio.get_running_loop().create_task(settle_game(game, results))
+    _settlements[game['id']] = task
+    task.add_done_callback(lambda _: _settlements.pop(game['id'], None))
+
+def finished_results(game):
+    """(user_id, username, won) for every player of a FINISHED game, rebuilt from its positions."""
+    if game['team_mode']:
+        winner_team = check_team_victory(game)
+        return [(p['user_id'], p['username'], p['team_id'] == winner_team) for p in game['players']]
+    return [
+        (p['user_id'], p['username'], all(t['position'] == 99 for t in p['tokens']))
+        for p in game['players']
+    ]
+
+async def recover_settlements():
+    """
+    Settles FINISHED games whose settlement never committed (the process
+    stopped after the winner was announced). Safe on every instance:
+    settlement closes a game at most once.
+    """
+    for game in await db.get_finished_games():
+        print(f"Recovering settlement of game {game['id']}")
+        start_settlement(game, finished_results(game))
+
+async def move_handler(client, callback_query, token_idx, version=None):
     chat_id = callback_query.message.chat.id
     
     try:
-        game = await db.get_game(chat_id)
+        rejection = cached_rejection(chat_id, callback_query.from_user.id, 'move', version, token_idx)
+        if rejection:
+            return await answer_rejection(callback_query, rejection)
         
-        # Validate game exists and is active
-        if not game:
-            return await callback_query.answer("Game not found!", show_alert=True)
+        # Move, kills, victory check and turn management in one transaction
+        outcome = await db.move(chat_id, callback_query.from_user.id, token_idx, version)
+        result = outcome['result']
+        if result in REJECTIONS:
+            return await answer_rejection(callback_query, result)
         
-        if game['status'] != 'PLAYING':
-            return await callback_query.answer("Game is not active!", show_alert=True)
+        game = outcome['game']
+        curr_player = outcome['player']
         
-        curr_player = game['players'][game['current_turn_index']]
-        if callback_query.from_user.id != curr_player['user_id']:
-            return await callback_query.answer("Not your turn!")
-            
-        dice_val = game['dice_value']
-        if dice_val == 0:
-            return await callback_query.answer("Roll the dice first!")
-
-        new_pos, finished = move_token(curr_player, token_idx, dice_val)
-        if new_pos == curr_player['tokens'][token_idx]['position']:
-            return await callback_query.answer("Invalid move for this token.")
-
-        # Update Token
-        await db.update_token(curr_player['tokens'][token_idx]['id'], new_pos, finished)
-        
-        # Killing logic
-        killing_impact = get_killing_impact(game, curr_player['color'], new_pos)
-        for p_idx, t_idx in killing_impact:
-            victim_token_id = game['players'][p_idx]['tokens'][t_idx]['id']
-            await db.update_token(victim_token_id, -1, False)
-
-        # Check Victory
-        # Need to fetch fresh state for victory check
-        game = await db.get_game(chat_id)
-        winner_team = check_team_victory(game) if game['team_mode'] else None
-        
-        # Simplified solo victory check if not team mode
-        if not game['team_mode']:
-            if all(t['position'] == 99 for t in curr_player['tokens']):
-                await callback_query.message.reply(f"🎉 @{curr_player['username']} HAS WON!")
-                # Update winner stats
-                await db.update_user_stats(curr_player['user_id'], curr_player['username'], won=True)
-                # Update other players stats
-                for p in game['players']:
-                    if p['user_id'] != curr_player['user_id']:
-                        await db.update_user_stats(p['user_id'], p['username'], won=False)
-                
-                await db.close_game(chat_id)
-                return
+        if result == 'won':
+            await callback_query.message.reply(f"🎉 @{curr_player['username']} HAS WON!")
+            results = [(p['user_id'], p['username'], p['user_id'] == curr_player['user_id']) for p in game['players']]
+            start_settlement(game, results)
+            return
 
-        if winner_team:
+        if result == 'team_won':
+            winner_team = outcome['winner_team']
             await callback_query.message.reply(f"🏆 TEAM {winner_team} HAS WON!")
-            # Update stats for all players
-            for p in game['players']:
-                is_winner = (p['team_id'] == winner_team)
-                await db.update_user_stats(p['user_id'], p['username'], won=is_winner)
-                
-            await db.close_game(chat_id)
+            results = [(p['user_id'], p['username'], p['team_id'] == winner_team) for p in game['players']]
+            start_settlement(game, results)
             return
-
-        # Turn management
-        # Extra turn on 6 or kill
-        if dice_val == 6 or killing_impact:
-            await db.update_game_state(game['id'], dice_value=0)
-        else:
-            await skip_turn(game)
             
-        await send_board(client, chat_id, callback_query.message.id)
+        await send_board(client, chat_id, callback_query.message.id, game=game)
     
     except Exception as e:
         # Handle any unexpected errors
@@ -220,9 +282,26 @@ async def move_handler(client, callback_query, token_idx):
         except:
             pass
 
-async def skip_turn(game):
-    next_turn = (game['current_turn_index'] + 1) % len(game['players'])
-    await db.update_game_state(game['id'], current_turn_index=next_turn, dice_value=0, consecutive_sixes=0)
+async def skip_handler(client, callback_query, version=None):
+    chat_id = callback_query.message.chat.id
+    
+    try:
+        rejection = cached_rejection(chat_id, callback_query.from_user.id, 'skip', version)
+        if rejection:
+            return await answer_rejection(callback_query, rejection)
+        
+        outcome = await db.skip(chat_id, callback_query.from_user.id, version)
+        result = outcome['result']
+        if result in REJECTIONS:
+            return await answer_rejection(callback_query, result)
+        
+        await callback_query.answer()
+        await send_board(client, chat_id, callback_query.message.id, game=outcome['game'])
+    except Exception as e:
+        try:
+            await callback_query.answer("⚠️ An error occurred. Please try again.", show_alert=True)
+        except:
+            pass
 
 async def stop_game_handler(client, update):
     is_callback = hasattr(update, "data")
@@ -232,7 +311,10 @@ async def stop_game_handler(client, update):
     
     try:
         game = await db.get_game(chat_id)
-        if not game:
+        # A FINISHED game is closed by its settlement; restart it if none is pending
+        if game and game['status'] == 'FINISHED':
+            start_settlement(game, finished_results(game))
+        if not game or game['status'] == 'FINISHED':
             if is_callback: await update.answer("Game already closed.")
             else: await message.reply("No active game to stop.")
             return
@@ -247,13 +329,17 @@ async def stop_game_handler(client, update):
             return
 
         await db.close_game(chat_id)
+        render_service.forget_chat(chat_id)
         
         stop_text = f"🛑 **Game Stopped** by @{user.username or user.first_name}"
         
         if is_callback:
             try:
-                # Use edit_message_caption for InputMediaPhoto (standard for send_board)
-                await client.edit_message_caption(chat_id, message.id, caption=stop_text)
+                # Image boards carry a caption, lite boards are plain text
+                if message.photo:
+                    await client.edit_message_caption(chat_id, message.id, caption=stop_text)
+                else:
+                    await client.edit_message_text(chat_id, message.id, stop_text)
                 await update.answer("Game has been stopped.")
             except Exception as e:
                 # Fallback to a new message if edit fails
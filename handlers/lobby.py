@@ -1,6 +1,7 @@
 from pyrogram import types
 from db import db
 from team_logic import get_team_id
+from handlers.game import start_settlement, finished_results
 from config import COLORS
 
 async def join_handler(client, message, user=None):
@@ -19,6 +20,10 @@ async def join_handler(client, message, user=None):
     except Exception as e:
         return await message.reply("❌ Error creating game. Please try again.")
     
+    if game['status'] == 'FINISHED':
+        # Its settlement closes it; restart one if it was lost (no-op while one is pending)
+        start_settlement(game, finished_results(game))
+        return await message.reply("⏳ Finishing the last game, try again in a moment.")
     if game['status'] != 'LOBBY':
         return await message.reply("Game already in progress.")
         
@@ -58,6 +58,7 @@ async def help_menu_handler(client, callback_query):
         "**Commands:**\n"
         "/ludo - Start a game (Groups)\n"
         "/staterank - Global wins/rank\n"
+        "/top - Global leaderboard\n"
         "/seasoncredits - Your balance\n\n"
         "**How to Play:**\n"
         "1. Start in a group with /ludo.\n"
@@ -0,0 +1,52 @@
+from db import db
+from board_renderer import RENDER_PROFILES, DEFAULT_PROFILE
+
+PROFILE_LABELS = {
+    "full": "1000px JPEG (default quality)",
+    "medium": "500px JPEG (lighter upload)",
+    "small": "334px JPEG (lowest bandwidth)",
+    "webp": "500px WebP",
+}
+
+async def quality_handler(client, message):
+    """/quality [profile] - shows or sets the board image profile for this chat."""
+    chat_id = message.chat.id
+    args = message.command[1:] if message.command else []
+
+    if not args:
+        current = await db.get_render_profile(chat_id) or DEFAULT_PROFILE
+        options = "\n".join([f"• `{name}` - {PROFILE_LABELS.get(name, name)}" for name in RENDER_PROFILES])
+        return await message.reply(
+            f"**🖼 Board Quality:** `{current}`\n\n{options}\n\nUse /quality <name> to change it."
+        )
+
+    profile = args[0].lower()
+    if profile not in RENDER_PROFILES:
+        return await message.reply(f"Unknown profile `{profile}`. Choose one of: {', '.join(RENDER_PROFILES)}.")
+
+    await db.set_render_profile(chat_id, profile)
+    await message.reply(f"✅ Board quality set to `{profile}` ({PROFILE_LABELS.get(profile, profile)}).")
+
+async def lite_handler(client, message):
+    """/lite [on|off] - shows or toggles the text-only board for this chat."""
+    chat_id = message.chat.id
+    args = message.command[1:] if message.command else []
+
+    if not args:
+        settings = await db.get_chat_settings(chat_id)
+        current = "on" if settings['lite_mode'] else "off"
+        return await message.reply(
+            f"**📝 Lite Board:** `{current}`\n\n"
+            "Lite mode sends the board as an emoji text message instead of an image: "
+            "much lighter for slow connections and big groups.\n\nUse /lite on or /lite off."
+        )
+
+    choice = args[0].lower()
+    if choice not in ("on", "off"):
+        return await message.reply("Use /lite on or /lite off.")
+
+    await db.set_lite_mode(chat_id, choice == "on")
+    if choice == "on":
+        await message.reply("✅ Lite board enabled. The board will be sent as text from the next move.")
+    else:
+        await message.reply("✅ Lite board disabled. The board will be sent as an image from the next move.")
@@ -1,5 +1,5 @@
 from pyrogram import types
-from db import db
+from db import db, LEADERBOARD_PAGE_SIZE
 
 async def help_handler(client, message):
     help_text = (
@@ -8,6 +8,9 @@ async def help_handler(client, message):
         "/ludo - Start a new game lobby in a group\n"
         "/staterank - View your stats and global rank\n"
         "/seasoncredits - View your current credits\n"
+        "/top - Global leaderboard\n"
+        "/quality - Board image size/quality for this group\n"
+        "/lite - Text-only board for slow connections\n"
         "/help - Show this message\n\n"
         "**How to Play:**\n"
         "1. Start a game with /ludo.\n"
@@ -46,3 +49,36 @@ async def credits_handler(client, message):
         
     text = f"**💳 Your Season Credits:** {stats['credits']}"
     await message.reply(text)
+
+def leaderboard_page(rows, first_page):
+    """Text and keyboard for one /top page; 'Next' carries the keyset cursor."""
+    if not rows:
+        text = "**🏆 Global Leaderboard**\n\nNo games played yet!" if first_page else "**🏆 Global Leaderboard**\n\nNo more players."
+    else:
+        lines = [f"**#{r['rank']}** @{r['username']} - {r['wins']} wins ({r['matches']} games)" for r in rows]
+        text = "**🏆 Global Leaderboard**\n\n" + "\n".join(lines)
+
+    buttons = []
+    if not first_page:
+        buttons.append(types.InlineKeyboardButton("🔝 Top", callback_data="top:first"))
+    if len(rows) == LEADERBOARD_PAGE_SIZE:
+        last = rows[-1]
+        buttons.append(types.InlineKeyboardButton("Next ▶️", callback_data=f"top:{last['wins']}:{last['user_id']}"))
+    return text, types.InlineKeyboardMarkup([buttons]) if buttons else None
+
+async def top_handler(client, message):
+    rows = await db.get_leaderboard()
+    text, keyboard = leaderboard_page(rows, first_page=True)
+    await message.reply(text, reply_markup=keyboard)
+
+async def top_callback_handler(client, callback_query):
+    # top:first or top:<wins>:<user_id> (last row of the previous page)
+    parts = callback_query.data.split(":")
+    after = (int(parts[1]), int(parts[2])) if len(parts) == 3 else None
+    rows = await db.get_leaderboard(after)
+    text, keyboard = leaderboard_page(rows, first_page=after is None)
+    try:
+        await callback_query.edit_message_text(text, reply_markup=keyboard)
+    except Exception as e:
+        pass # Unchanged page
+    await callback_query.answer()
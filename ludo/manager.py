@@ -5,7 +5,7 @@ import time
 from typing import Dict, List, Optional
 from .state import GameState, Player, Token, Tournament, Match
 from .rules import get_valid_moves, move_token, is_game_over
-import db
+from db import db
 
 class LudoManager:
     def __init__(self):
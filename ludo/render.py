@@ -1,5 +1,8 @@
 from .state import GameState
+from .rules import TRACK_POSITIONS
+from cache import LRUCache
 from config import COLORS
+from coordinate_system import GRID_SIZE, MAIN_PATH_GRID, HOME_PATH_GRID, HOME_BASE_GRID, SAFE_ZONE_INDICES, TOKEN_CELLS, POSITION_SPAN
 
 # Pre-defined Coordinate Mapping for Tokens
 # (y, x) coordinates for main track (0-51)
@@ -67,11 +70,30 @@ def generate_base_board():
 
 # Global Static Board
 BASE_BOARD = generate_base_board()
+# (y, x) square of every relative position 0-55 per colour: track first, then home path
+TOKEN_SQUARES = tuple(
+    tuple(MAIN_TRACK_COORDS[TRACK_POSITIONS[color][pos]] for pos in range(51)) + tuple(HOME_PATHS[color])
+    for color in range(4)
+)
+# Rows pre-joined once; only rows with a token on them are rebuilt per render
+BASE_ROWS = ["".join(row) for row in BASE_BOARD]
+
+def render_rows(base_board, base_rows, cells):
+    """Joins the board rows, rebuilding only those that `cells` ((y, x) -> emoji) touches."""
+    touched = {}
+    for (y, x), char in cells.items():
+        touched.setdefault(y, []).append((x, char))
+    rows = list(base_rows)
+    for y, row_cells in touched.items():
+        row = base_board[y][:]
+        for x, char in row_cells:
+            row[x] = char
+        rows[y] = "".join(row)
+    return rows
 
 def render_board(state: GameState) -> str:
     """Optimized renderer that overlays tokens on a base board template."""
-    # Copy the static base board
-    board = [row[:] for row in BASE_BOARD]
+    cells = {}
     
     # Overlay Tokens
     for p in state.players:
@@ -83,21 +105,81 @@ def render_board(state: GameState) -> str:
             if t.state == "home":
                 # Render inside room if space available
                 if home_idx < len(p_room):
-                    ry, rx = p_room[home_idx]
-                    board[ry][rx] = color_char
+                    cells[p_room[home_idx]] = color_char
                     home_idx += 1
             elif t.state == "active":
-                if t.pos <= 50:
-                    # Circular track coordinate
-                    from .rules import get_track_pos
-                    track_idx = get_track_pos(p.color_index, t.pos)
-                    y, x = MAIN_TRACK_COORDS[track_idx]
-                    board[y][x] = color_char
-                elif 51 <= t.pos <= 55:
-                    # Home path coordinate
-                    path_idx = t.pos - 51
-                    y, x = HOME_PATHS[p.color_index][path_idx]
-                    board[y][x] = color_char
+                # Track or home path coordinate
+                if 0 <= t.pos <= 55:
+                    cells[TOKEN_SQUARES[p.color_index][t.pos]] = color_char
             # "finished" tokens are explicitly NOT rendered
             
-    return "\n".join(["".join(row) for row in board])
+    return "\n".join(render_rows(BASE_BOARD, BASE_ROWS, cells))
+
+# Lite board: the DB game (handlers/game.py) as text, laid out on the same
+# grid as board_renderer's image so every position lands on the same square.
+LITE_CORNERS = {
+    0: ((0, 9), "🟥"), # Red (BL)
+    1: ((9, 9), "🟩"), # Green (BR)
+    2: ((9, 0), "🟨"), # Yellow (TR)
+    3: ((0, 0), "🟦"), # Blue (TL)
+}
+
+def generate_lite_board():
+    """Static lite board, indexed [y][x] like BASE_BOARD."""
+    board = [["⬛" for _ in range(GRID_SIZE)] for _ in range(GRID_SIZE)]
+    for color, ((x0, y0), square) in LITE_CORNERS.items():
+        for y in range(y0, y0 + 6):
+            for x in range(x0, x0 + 6): board[y][x] = square
+        for x, y in HOME_BASE_GRID[color]: board[int(y)][int(x)] = "⬜"
+        for x, y in HOME_PATH_GRID[color]: board[y][x] = square
+    for idx, (x, y) in enumerate(MAIN_PATH_GRID):
+        board[y][x] = "🛡️" if idx in SAFE_ZONE_INDICES else "⬜"
+    board[7][7] = "👑"
+    return board
+
+LITE_BOARD = generate_lite_board()
+LITE_ROWS = ["".join(row) for row in LITE_BOARD]
+
+# chat_id -> (per-row token cells, joined rows) of the last lite board sent
+_lite_frames = LRUCache(1024)
+
+def lite_cells(game_state):
+    """(y, x) -> emoji for every token on the board. The player to move is drawn last, so their tokens stay visible on shared squares."""
+    players = game_state['players']
+    curr_turn = game_state.get('current_turn_index', 0)
+    cells = {}
+    for player in players[:curr_turn] + players[curr_turn + 1:] + players[curr_turn:curr_turn + 1]:
+        color = player['color']
+        char = COLORS[color]
+        base = color * POSITION_SPAN + 1
+        for t in player['tokens']:
+            cell = TOKEN_CELLS[(base + t['position']) * 4 + t['token_index']]
+            if cell is None: continue # Finished tokens sit under the crown
+            cells[(cell[1], cell[0])] = char
+    return cells
+
+def render_lite_board(game_state):
+    """
+    Text version of the board for a DB game dict. When the state carries a
+    chat_id, rows whose tokens did not change since that chat's last board
+    are reused as-is.
+    """
+    touched = {}
+    for (y, x), char in lite_cells(game_state).items():
+        touched.setdefault(y, []).append((x, char))
+    touched = {y: tuple(sorted(row_cells)) for y, row_cells in touched.items()}
+
+    chat_id = game_state.get('chat_id')
+    last = _lite_frames.get(chat_id) if chat_id is not None else None
+    last_touched, rows = (last[0], list(last[1])) if last else ({}, list(LITE_ROWS))
+    for y in touched.keys() | last_touched.keys():
+        row_cells = touched.get(y)
+        if row_cells == last_touched.get(y): continue
+        row = LITE_BOARD[y][:]
+        for x, char in row_cells or ():
+            row[x] = char
+        rows[y] = "".join(row)
+
+    if chat_id is not None:
+        _lite_frames.put(chat_id, (touched, rows))
+    return "\n".join(rows)
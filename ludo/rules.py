@@ -1,5 +1,7 @@
 from typing import List, Tuple
 from .state import GameState, Player, Token
+from config import SAFE_POSITIONS
+from rules_core import BASE, FINISHED, make_geometry, is_legal, apply_move
 import logging
 
 logger = logging.getLogger(__name__)
@@ -12,30 +14,56 @@ START_POSITIONS = {
     3: 39   # Blue
 }
 
+# TRACK_POSITIONS[color][relative_pos] -> shared track position, for relative 0-50
+TRACK_POSITIONS = tuple(
+    tuple((START_POSITIONS[color] + rel) % 52 for rel in range(51))
+    for color in range(4)
+)
+
+# The dataclass engine's geometry for the rules core: relative position r on
+# the track is square (start + r) % 52, 51-55 are the home path, 56 is finished.
+# SAFE_POSITIONS is 1-based.
+CLASSIC_GEOMETRY = make_geometry(
+    [START_POSITIONS[color] for color in range(4)],
+    [(START_POSITIONS[color] + 50) % 52 for color in range(4)],
+    5,
+    [p - 1 for p in SAFE_POSITIONS],
+)
+
+def token_position(color_index: int, token: Token) -> int:
+    """Adapter: a Token as a core position."""
+    if token.state == "home": return BASE
+    if token.state == "finished": return FINISHED
+    if token.pos <= 50: return TRACK_POSITIONS[color_index][token.pos]
+    return 52 + token.pos - 51
+
+def set_token_position(token: Token, color_index: int, position: int):
+    """Adapter: writes a core position back onto a Token."""
+    if position == BASE:
+        token.pos, token.state = 0, "home"
+    elif position == FINISHED:
+        token.pos, token.state = 56, "finished"
+    elif position < 52:
+        token.pos, token.state = (position - START_POSITIONS[color_index]) % 52, "active"
+    else:
+        token.pos, token.state = 51 + position - 52, "active"
+
+def state_positions(state: GameState) -> List[int]:
+    positions = [BASE] * 16
+    for player in state.players:
+        for t_idx, token in enumerate(player.tokens):
+            positions[player.color_index * 4 + t_idx] = token_position(player.color_index, token)
+    return positions
+
 def get_track_pos(color_index: int, relative_pos: int) -> int:
     """
     Converts relative position (0-50) to shared track position (0-51).
     relative_pos 0 is the starting square for that color.
     """
-    start = START_POSITIONS[color_index]
-    return (start + relative_pos) % 52
+    return TRACK_POSITIONS[color_index][relative_pos]
 
 def can_move_token(player: Player, token_index: int, dice: int) -> bool:
-    token = player.tokens[token_index]
-    
-    if token.state == "home":
-        return dice == 6
-    
-    if token.state == "finished":
-        return False
-    
-    if token.state == "active":
-        # Check if the move would overshoot the finish (56)
-        if (token.pos + dice) > 56:
-            return False
-        return True
-    
-    return False
+    return is_legal(CLASSIC_GEOMETRY, player.color_index, token_position(player.color_index, player.tokens[token_index]), dice)
 
 def move_token(state: GameState, player_index: int, token_index: int, dice: int) -> bool:
     """
@@ -45,47 +73,17 @@ def move_token(state: GameState, player_index: int, token_index: int, dice: int)
     player = state.players[player_index]
     if token_index < 0 or token_index >= len(player.tokens):
         return False
-        
-    token = player.tokens[token_index]
-    killed = False
     
-    if token.state == "home":
-        if dice == 6:
-            token.state = "active"
-            token.pos = 0 # Just entered track
-        else:
-            return False # Should not happen if get_valid_moves is used
-    elif token.state == "active":
-        if (token.pos + dice) <= 56:
-            token.pos += dice
-            # Check if finished
-            if token.pos == 56:
-                token.state = "finished"
-        else:
-            return False
-            
-    # Collision detection (only if on main track 0-50)
-    if token.state == "active" and token.pos <= 50:
-        global_pos = get_track_pos(player.color_index, token.pos)
-        
-        # Safe zones
-        from config import SAFE_POSITIONS
-        safe_spots = [p - 1 for p in SAFE_POSITIONS]
-        
-        if global_pos not in safe_spots:
-            for other_idx, other_player in enumerate(state.players):
-                if other_idx == player_index: continue
-                
-                for other_token in other_player.tokens:
-                    if other_token.state == "active" and other_token.pos <= 50:
-                        other_global = get_track_pos(other_player.color_index, other_token.pos)
-                        if other_global == global_pos:
-                            # Kill it!
-                            other_token.state = "home"
-                            other_token.pos = 0
-                            killed = True
+    result = apply_move(CLASSIC_GEOMETRY, state_positions(state), player.color_index, token_index, dice)
+    if result is None:
+        return False # Should not happen if get_valid_moves is used
+    new_pos, killed = result
+    set_token_position(player.tokens[token_index], player.color_index, new_pos)
     
-    return killed
+    by_color = {p.color_index: p for p in state.players}
+    for slot in killed:
+        set_token_position(by_color[slot >> 2].tokens[slot & 3], slot >> 2, BASE)
+    return bool(killed)
 
 def is_game_over(player: Player) -> bool:
     return all(token.state == "finished" for token in player.tokens)
@@ -1,13 +1,40 @@
 from dataclasses import dataclass, field
 from typing import List, Dict, Optional
 import json
+import struct
 
-@dataclass
+# Binary codec (GameState.to_bytes / from_bytes). Bump the version whenever the
+# layout changes and keep decoding the old ones.
+STATE_CODEC_VERSION = 2 # 2: strings have a 2-byte length (1 capped them at 255 bytes)
+TOKEN_STATES = ("home", "active", "finished")
+_TOKEN_STATE_CODES = {state: code << 6 for code, state in enumerate(TOKEN_STATES)}
+_HEADER = struct.Struct("<BBqBBdB")  # version, flags, chat_id, turn, dice (0 = none), last_roll_time, players
+_PLAYER = struct.Struct("<qBB")      # user_id, color_index, is_active
+_WINNER = struct.Struct("<q")
+_STR_LEN = struct.Struct("<H")
+_LOBBY, _WINNER_SET, _MATCH_SET, _TOURNAMENT_SET = 1, 2, 4, 8
+
+def _pack_str(value: str) -> bytes:
+    raw = value.encode()
+    if len(raw) > 0xFFFF:
+        raise ValueError(f"String of {len(raw)} UTF-8 bytes is too long for the state codec")
+    return _STR_LEN.pack(len(raw)) + raw
+
+def _unpack_str(data, offset: int, version: int = STATE_CODEC_VERSION):
+    if version == 1:
+        end = offset + 1 + data[offset]
+        # Version 1 capped strings at 255 bytes, which can split a multi-byte character
+        return bytes(data[offset + 1:end]).decode(errors="ignore"), end
+    start = offset + _STR_LEN.size
+    end = start + _STR_LEN.unpack_from(data, offset)[0]
+    return bytes(data[start:end]).decode(), end
+
+@dataclass(slots=True)
 class Token:
     pos: int = 0      # 0-50 on track, 51-55 home path, 56 finished
     state: str = "home" # "home", "active", "finished"
 
-@dataclass
+@dataclass(slots=True)
 class Player:
     user_id: int
     first_name: str
@@ -15,7 +42,7 @@ class Player:
     tokens: List[Token] = field(default_factory=lambda: [Token() for _ in range(4)])
     is_active: bool = True
 
-@dataclass
+@dataclass(slots=True)
 class GameState:
     chat_id: int
     players: List[Player]
@@ -71,8 +98,65 @@ class GameState:
             tournament_id=data.get("tournament_id")
         )
 
+    def to_bytes(self) -> bytes:
+        """
+        Compact binary form: a fixed header, then per player the ids, a
+        length-prefixed name and one byte per token (state << 6 | pos).
+        Strings over 65535 UTF-8 bytes raise ValueError.
+        """
+        flags = (
+            (_LOBBY if self.is_lobby else 0)
+            | (_WINNER_SET if self.winner is not None else 0)
+            | (_MATCH_SET if self.match_id is not None else 0)
+            | (_TOURNAMENT_SET if self.tournament_id is not None else 0)
+        )
+        parts = [_HEADER.pack(
+            STATE_CODEC_VERSION, flags, self.chat_id, self.current_turn_index,
+            self.dice_value or 0, self.last_roll_time, len(self.players)
+        )]
+        if self.winner is not None: parts.append(_WINNER.pack(self.winner))
+        if self.match_id is not None: parts.append(_pack_str(self.match_id))
+        if self.tournament_id is not None: parts.append(_pack_str(self.tournament_id))
+        for p in self.players:
+            parts.append(_PLAYER.pack(p.user_id, p.color_index, p.is_active))
+            parts.append(_pack_str(p.first_name))
+            parts.append(bytes([len(p.tokens), *[_TOKEN_STATE_CODES[t.state] | t.pos for t in p.tokens]]))
+        return b"".join(parts)
+
+    @classmethod
+    def from_bytes(cls, data: bytes):
+        version, flags, chat_id, turn, dice, last_roll_time, n_players = _HEADER.unpack_from(data)
+        if version not in (1, STATE_CODEC_VERSION):
+            raise ValueError(f"Unsupported game state codec version {version}")
+        offset = _HEADER.size
+        winner = match_id = tournament_id = None
+        if flags & _WINNER_SET:
+            winner, = _WINNER.unpack_from(data, offset)
+            offset += _WINNER.size
+        if flags & _MATCH_SET: match_id, offset = _unpack_str(data, offset, version)
+        if flags & _TOURNAMENT_SET: tournament_id, offset = _unpack_str(data, offset, version)
+        players = []
+        for _ in range(n_players):
+            user_id, color_index, is_active = _PLAYER.unpack_from(data, offset)
+            first_name, offset = _unpack_str(data, offset + _PLAYER.size, version)
+            n_tokens = data[offset]
+            tokens = [Token(pos=b & 63, state=TOKEN_STATES[b >> 6]) for b in data[offset + 1:offset + 1 + n_tokens]]
+            offset += 1 + n_tokens
+            players.append(Player(user_id=user_id, first_name=first_name, color_index=color_index, tokens=tokens, is_active=bool(is_active)))
+        return cls(
+            chat_id=chat_id,
+            players=players,
+            current_turn_index=turn,
+            dice_value=dice or None,
+            last_roll_time=last_roll_time,
+            is_lobby=bool(flags & _LOBBY),
+            winner=winner,
+            match_id=match_id,
+            tournament_id=tournament_id
+        )
+
 # Tournament Infrastructure (Structure Only)
-@dataclass
+@dataclass(slots=True)
 class Match:
     match_id: str
     players: List[int] # user_ids
@@ -96,7 +180,7 @@ class Match:
             chat_id=data.get("chat_id")
         )
 
-@dataclass
+@dataclass(slots=True)
 class Tournament:
     tournament_id: str
     players: List[int]
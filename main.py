@@ -4,6 +4,8 @@ from fastapi import FastAPI, Request
 from pyrogram import types
 from bot import app as bot_app
 from db import db
+from render_service import render_service
+from handlers.game import recover_settlements
 from config import WEBHOOK_URL
 
 import logging
@@ -18,6 +20,11 @@ async def startup_event():
         # Initialize DB
         await db.init_db()
         logger.info("Database initialized.")
+        # Finish settling games a previous process announced but never closed
+        await recover_settlements()
+        # Spawn and pre-warm board render workers
+        render_service.start()
+        logger.info("Render workers started.")
         # Start bot
         await bot_app.start()
         logger.info("Bot started.")
@@ -32,6 +39,7 @@ async def startup_event():
 async def shutdown_event():
     await bot_app.stop()
     await db.disconnect()
+    render_service.shutdown()
 
 @fastapi_app.post("/webhook")
 async def telegram_webhook(request: Request):
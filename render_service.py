@@ -0,0 +1,99 @@
+import asyncio
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+import board_renderer
+from config import RENDER_WORKERS, RENDER_QUEUE_SIZE, RENDER_QUEUE_TIMEOUT
+
+class RenderOverloaded(Exception):
+    """Raised when no render slot frees up within RENDER_QUEUE_TIMEOUT."""
+
+def _warm_worker():
+    # Importing the renderer loads the base board and builds the sprites once per process
+    import board_renderer
+
+def _ping():
+    return True
+
+def _encode_in_worker(game_state, profile):
+    return board_renderer.encode_board(game_state, profile)
+
+def _forget_in_worker(chat_id):
+    board_renderer.forget_chat(chat_id)
+
+class RenderService:
+    """
+    Renders boards in worker processes so the event loop never runs Pillow.
+
+    Each worker is its own single-process pool and chats are sharded by
+    chat_id, so a chat always lands on the worker that holds its last frame.
+    At most `queue_size` renders may be queued or running; further callers
+    wait for a slot and get RenderOverloaded if none frees up in time.
+    Encoded images are cached in this process, so cache hits skip the IPC.
+    """
+
+    def __init__(self, workers=RENDER_WORKERS, queue_size=RENDER_QUEUE_SIZE, queue_timeout=RENDER_QUEUE_TIMEOUT):
+        self.workers = max(1, workers)
+        self.queue_timeout = queue_timeout
+        self._slots = asyncio.Semaphore(queue_size)
+        self._pools = []
+
+    def _new_pool(self):
+        return ProcessPoolExecutor(
+            max_workers=1,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_warm_worker
+        )
+
+    def start(self):
+        """Spawns and pre-warms the workers. Safe to call more than once."""
+        if self._pools: return
+        self._pools = [self._new_pool() for _ in range(self.workers)]
+        for pool in self._pools:
+            pool.submit(_ping) # Forces the process (and its initializer) to start now
+
+    def shutdown(self):
+        for pool in self._pools:
+            pool.shutdown(wait=False, cancel_futures=True)
+        self._pools = []
+
+    def _shard(self, chat_id):
+        return hash(chat_id) % len(self._pools)
+
+    async def render(self, game_state, profile=None):
+        """Returns the board image as a BytesIO, like board_renderer.render_board."""
+        key = board_renderer.board_key(game_state, profile)
+        data = board_renderer.IMAGE_CACHE.get(key)
+        if data is not None:
+            return board_renderer.board_buffer(data, profile)
+
+        self.start()
+        try:
+            await asyncio.wait_for(self._slots.acquire(), self.queue_timeout)
+        except asyncio.TimeoutError:
+            raise RenderOverloaded()
+
+        shard = self._shard(game_state.get('chat_id'))
+        try:
+            loop = asyncio.get_running_loop()
+            data = await loop.run_in_executor(self._pools[shard], _encode_in_worker, game_state, profile)
+        except BrokenProcessPool:
+            # Worker died (e.g. OOM); replace it so the next render gets a fresh process
+            self._pools[shard] = self._new_pool()
+            raise
+        finally:
+            self._slots.release()
+
+        board_renderer.IMAGE_CACHE.put(key, data)
+        return board_renderer.board_buffer(data, profile)
+
+    def forget_chat(self, chat_id):
+        """Drops the chat's last frame in the worker that owns it."""
+        if not self._pools: return
+        try:
+            self._pools[self._shard(chat_id)].submit(_forget_in_worker, chat_id)
+        except RuntimeError:
+            pass # Pool shutting down
+
+render_service = RenderService()
@@ -0,0 +1,125 @@
+"""
+One rules core for both engines: game_logic / team_logic (DB game dicts) and
+ludo.rules (ludo.state.GameState).
+
+Positions share the compact encoding games.positions uses: -1 base, 0-51 the
+shared track, 52 + i the i-th home-stretch square, 99 finished. A game is a
+flat list of 16 positions, slot color * 4 + token_index. What differs between
+the engines (start squares, home entrances, home-stretch length, safe
+squares) is a Geometry; each engine's adapter converts its own token format
+to and from the compact one.
+
+An occupancy indexes the same positions by square: one 16-bit mask per
+position -1..57 (entry position + 1), bit `slot` set while that token stands
+there. Finished tokens are not indexed. Colours use separate bit groups, so
+home stretches and bases share entries without mixing. apply_move keeps it in
+step with `positions`; kills and stacks are then mask tests, not scans.
+"""
+from collections import namedtuple
+
+BASE = -1
+FINISHED = 99
+TRACK = 52
+
+# moves[color][position + 1][dice - 1] -> new position, the same one when the
+# move is illegal. Covers every position -1..99.
+Geometry = namedtuple("Geometry", "start entrance home_length safe moves")
+
+# KILLABLE[team_mode][color] -> bit mask of the slots a `color` token can send
+# back to base: every other colour, minus the teammate (same colour parity,
+# as in team_logic.get_team_id) in team mode.
+KILLABLE = tuple(
+    tuple(
+        sum(0xF << other * 4 for other in range(4) if other != color and not (team_mode and other % 2 == color % 2))
+        for color in range(4)
+    )
+    for team_mode in (False, True)
+)
+
+OCCUPANCY_SIZE = TRACK + 7 # -1 (base) through 57, the longest home stretch's end
+
+def _step(start, entrance, home_length, color, pos, dice):
+    if pos == BASE:
+        return start[color] if dice == 6 else pos
+    if 0 <= pos < TRACK:
+        # `entrance` is the last track square before the colour's home stretch
+        to_entrance = (entrance[color] - pos) % TRACK
+        if dice <= to_entrance:
+            return (pos + dice) % TRACK
+        home = dice - to_entrance - 1
+    elif TRACK <= pos < TRACK + home_length:
+        home = pos - TRACK + dice
+    else:
+        return pos # Finished, or a position no token can hold
+    if home < home_length: return TRACK + home
+    if home == home_length: return FINISHED # Exact roll only
+    return pos
+
+def make_geometry(start, entrance, home_length, safe_squares):
+    start, entrance = tuple(start), tuple(entrance)
+    moves = tuple(
+        tuple(tuple(_step(start, entrance, home_length, color, pos, dice) for dice in range(1, 7)) for pos in range(-1, 100))
+        for color in range(4)
+    )
+    return Geometry(start, entrance, home_length, sum(1 << square for square in safe_squares), moves)
+
+def is_legal(geometry, color, pos, dice):
+    return geometry.moves[color][pos + 1][dice - 1] != pos
+
+def build_occupancy(positions):
+    occupancy = [0] * OCCUPANCY_SIZE
+    for slot, pos in enumerate(positions):
+        if pos != FINISHED:
+            occupancy[pos + 1] |= 1 << slot
+    return occupancy
+
+def move_slot(occupancy, slot, old_pos, new_pos):
+    """Keeps an occupancy in step with one token moving (or being sent home)."""
+    bit = 1 << slot
+    if old_pos != FINISHED: occupancy[old_pos + 1] &= ~bit
+    if new_pos != FINISHED: occupancy[new_pos + 1] |= bit
+
+def iter_slots(mask):
+    """Set slots of a mask, lowest first."""
+    while mask:
+        low = mask & -mask
+        yield low.bit_length() - 1
+        mask ^= low
+
+def color_tokens(occupancy, color, pos):
+    """Tokens of `color` standing on `pos`, as a 4-bit mask of token indices."""
+    return occupancy[pos + 1] >> color * 4 & 0xF
+
+def killed_slots(geometry, occupancy, color, square, team_mode=False):
+    """Slots a `color` token landing on `square` sends back to base."""
+    if not 0 <= square < TRACK or geometry.safe >> square & 1: return []
+    return list(iter_slots(occupancy[square + 1] & KILLABLE[bool(team_mode)][color]))
+
+def apply_move(geometry, positions, color, token_index, dice, team_mode=False, occupancy=None):
+    """
+    Moves one token of `positions` in place and sends its victims home,
+    updating `occupancy` (built from `positions` when not given) to match.
+    Returns (new_pos, killed slots), or None when the move is illegal.
+    """
+    slot = color * 4 + token_index
+    old_pos = positions[slot]
+    new_pos = geometry.moves[color][old_pos + 1][dice - 1]
+    if new_pos == old_pos: return None
+    if occupancy is None: occupancy = build_occupancy(positions)
+    killed = killed_slots(geometry, occupancy, color, new_pos, team_mode)
+    positions[slot] = new_pos
+    move_slot(occupancy, slot, old_pos, new_pos)
+    for victim in killed:
+        positions[victim] = BASE
+        move_slot(occupancy, victim, new_pos, BASE)
+    return new_pos, killed
+
+def has_finished(positions, color):
+    return all(pos == FINISHED for pos in positions[color * 4:color * 4 + 4])
+
+def team_winner(positions, teams):
+    """`teams` maps each colour in the game to its team id (1 or 2)."""
+    for team in (1, 2):
+        if all(has_finished(positions, color) for color, team_id in teams.items() if team_id == team):
+            return team
+    return None
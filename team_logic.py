@@ -1,3 +1,5 @@
+from rules_core import BASE, team_winner
+
 def get_team_id(color):
     """
     Red (0) + Yellow (2) = Team 1
@@ -10,23 +12,21 @@ def get_team_id(color):
 def is_teammate(color1, color2):
     return get_team_id(color1) == get_team_id(color2)
 
+def game_positions(game):
+    """Adapter: a game dict's tokens as the core's 16-slot position list."""
+    positions = [BASE] * 16
+    for player in game['players']:
+        base = player['color'] * 4
+        for t_idx, token in enumerate(player['tokens']):
+            positions[base + t_idx] = token['position']
+    return positions
+
 def check_team_victory(game_state):
     """
     Team wins when BOTH teammates finish all tokens.
     """
-    team_finished = {1: True, 2: True}
-    
-    for player in game_state['players']:
-        team_id = player['team_id']
-        # If any player in the team hasn't finished all tokens, the team isn't finished
-        all_tokens_finished = all(t['position'] == 99 for t in player['tokens'])
-        if not all_tokens_finished:
-            team_finished[team_id] = False
-            
-    # Check if either team has won
-    if team_finished[1]: return 1
-    if team_finished[2]: return 2
-    return None
+    teams = {player['color']: player['team_id'] for player in game_state['players']}
+    return team_winner(game_positions(game_state), teams)
 
 def can_kill(attacker_color, victim_color, is_safe_zone):
     if is_safe_zone: return False
@@ -0,0 +1,153 @@
+"""
+Checks LudoDB's in-memory caches against a fake asyncpg pool, no Postgres needed.
+
+Usage:
+    python verify_db.py
+"""
+import asyncio
+import json
+import os
+import random
+import sys
+
+# db reads DATABASE_URL from config, which insists on the bot credentials
+for var in ("API_ID", "API_HASH", "BOT_TOKEN", "DATABASE_URL"):
+    os.environ.setdefault(var, "1")
+
+import db as db_module
+from db import LudoDB, HOT_QUERIES
+from ludo.manager import TournamentManager
+
+class FakeConnection:
+    def __init__(self, fetchval):
+        self.fetchval = fetchval
+
+class FakePool:
+    """pool.acquire() as an async context manager handing out one fake connection."""
+    def __init__(self, conn):
+        self.conn = conn
+
+    def acquire(self):
+        pool = self
+        class Acquire:
+            async def __aenter__(self): return pool.conn
+            async def __aexit__(self, *exc): return False
+        return Acquire()
+
+def doc_patch(doc, changes):
+    """ludo_doc_patch in Python: jsonb_set for changes with a value, #- for the rest."""
+    for change in changes:
+        parent = doc
+        for k in change['path'][:-1]:
+            parent = parent[int(k)] if isinstance(parent, list) else parent[k]
+        k = change['path'][-1]
+        if isinstance(parent, list): k = int(k)
+        if 'value' in change: parent[k] = change['value']
+        else: del parent[k]
+    return doc
+
+class FakeDocTable:
+    """One state-document table: key -> (rev, doc as JSON text), written the way _save_doc's SQL does."""
+    def __init__(self):
+        self.rows = {}
+
+    def doc(self, key):
+        return json.loads(self.rows[key][1])
+
+    async def fetchrow(self, query, key):
+        if key not in self.rows: return None
+        return {'doc': self.doc(key), 'rev': self.rows[key][0]}
+
+    async def fetchval(self, query, key, doc, rev=None):
+        if query.lstrip().startswith('UPDATE'):
+            if key not in self.rows or self.rows[key][0] != rev: return None
+            doc = doc_patch(self.doc(key), doc)
+        new_rev = self.rows[key][0] + 1 if key in self.rows else 0
+        self.rows[key] = (new_rev, json.dumps(doc))
+        return new_rev
+
+def make_game(chat_id, game_id, version):
+    return {'id': game_id, 'chat_id': chat_id, 'version': version, 'status': 'PLAYING', 'players': []}
+
+def notify(db, chat_id, game_id, version):
+    db._on_game_changed(None, 0, 'ludo_games', f"{chat_id}:{game_id}:{version}")
+
+async def check_game_cache(check):
+    db = LudoDB()
+    db.listener = object() # Subscribed: the game cache is on
+
+    # Another instance writes version 8 while our read of version 7 is in flight
+    async def racing_fetch(query, chat_id):
+        assert query == HOT_QUERIES['game']
+        notify(db, chat_id, 1, 8)
+        return make_game(chat_id, 1, 7)
+    db.pool = FakePool(FakeConnection(racing_fetch))
+    game = await db.get_game(10)
+    check(game['version'] == 7, "get_game returns what it read")
+    check(db.cached_game(10) is None, "a read older than a notified write is not cached")
+
+    async def fetch(query, chat_id):
+        return make_game(chat_id, 1, 8)
+    db.pool = FakePool(FakeConnection(fetch))
+    await db.get_game(10)
+    check(db.cached_game(10)['version'] == 8, "the notified version itself is cached")
+
+    # Deleted, then a new game for the chat starts again at version 0
+    notify(db, 10, 1, 'deleted')
+    check(db.cached_game(10) is None, "deletion evicts")
+    db.cache_game(make_game(10, 1, 8))
+    check(db.cached_game(10) is None, "a deleted game is not cached again")
+    notify(db, 10, 2, 0)
+    db.cache_game(make_game(10, 2, 0))
+    check(db.cached_game(10)['id'] == 2, "the chat's next game is cached")
+
+async def check_state_docs(check):
+    # Load -> mutate in place -> save, through the manager (from_dict keeps the loaded lists)
+    table = FakeDocTable()
+    db_module.db.pool = FakePool(table)
+    tournaments = TournamentManager()
+    t_id = await tournaments.create_tournament(1)
+    for user_id in (2, 3, 4):
+        check(await tournaments.join_tournament(t_id, user_id) == "Joined successfully!", "join")
+    check(table.doc(t_id)['players'] == [1, 2, 3, 4], "every join is stored")
+
+    random.seed(3)
+    check(await tournaments.start_tournament(t_id) is None, "start")
+    stored = table.doc(t_id)
+    pairs = [p for match in stored['rounds'][0] for p in match['players']]
+    check(stored['players'] == pairs and pairs != [1, 2, 3, 4], "the in-place shuffle is stored")
+    check(stored == (await tournaments.get_tournament(t_id)).to_dict(), "reload matches")
+
+    # Two instances patch the same row: the later one must not diff against a stale read
+    table = FakeDocTable()
+    a, b = LudoDB(), LudoDB()
+    a.pool = b.pool = FakePool(table)
+    await a.save_tournament_state('t', {'players': [1], 'status': 'waiting'})
+    doc_a = await a.get_tournament_state('t')
+    doc_b = await b.get_tournament_state('t')
+    doc_a['players'].append(2)
+    await a.save_tournament_state('t', doc_a)
+    doc_b['status'] = 'active'
+    await b.save_tournament_state('t', doc_b)
+    check(table.doc('t') == doc_b, "a save over another instance's write replaces the whole document")
+    doc_b['players'].append(3)
+    await b.save_tournament_state('t', doc_b)
+    check(table.doc('t') == doc_b, "saves after the fallback patch again")
+
+async def main():
+    failures = []
+    def check(ok, what):
+        if not ok: failures.append(what)
+
+    await check_game_cache(check)
+    await check_state_docs(check)
+
+    if failures:
+        print(f"❌ {len(failures)} failures:")
+        for failure in failures:
+            print(f"  {failure}")
+        sys.exit(1)
+    print("✅ DB caches behave")
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,255 @@
+"""
+Differential check of the rules core against the two engines it replaced.
+
+Plays seeded random games through the legacy implementations (copied below
+as they were before rules_core existed) and through the current adapters,
+comparing legal moves, every move result, kills and victory after each step.
+Mostly legal moves are picked, with some illegal attempts mixed in.
+
+Usage:
+    python verify_rules.py [--games 500] [--seed 1] [--max-turns 3000]
+"""
+import argparse
+import copy
+import os
+import random
+import sys
+
+# ludo.rules reads SAFE_POSITIONS from config, which insists on the bot credentials
+for var in ("API_ID", "API_HASH", "BOT_TOKEN", "DATABASE_URL"):
+    os.environ.setdefault(var, "1")
+
+import game_logic
+from ludo import rules
+from ludo.state import GameState, Player
+from rules_core import apply_move, build_occupancy
+from team_logic import check_team_victory, get_team_id, is_teammate
+
+# --- Legacy DB engine (game_logic.py / team_logic.py) ---
+
+LEGACY_START = {0: 23, 1: 36, 2: 49, 3: 10}
+LEGACY_ENTRANCE = {0: 25, 1: 38, 2: 51, 3: 12}
+LEGACY_SAFE_ZONE_INDICES = {10, 15, 23, 28, 36, 41, 49, 2}
+
+def legacy_db_move(player, token_idx, dice_value):
+    token = player['tokens'][token_idx]
+    current_pos = token['position']
+    color = player['color']
+
+    if current_pos == -1:
+        if dice_value == 6:
+            return LEGACY_START[color], False
+        return -1, False
+
+    if current_pos == 99:
+        return 99, False
+
+    if 0 <= current_pos <= 51:
+        threshold = LEGACY_ENTRANCE[color]
+        if current_pos <= threshold:
+            steps_to_threshold = threshold - current_pos
+        else:
+            steps_to_threshold = (52 - current_pos) + threshold
+
+        if dice_value <= steps_to_threshold:
+            return (current_pos + dice_value) % 52, False
+        else:
+            steps_into_home = dice_value - steps_to_threshold
+            new_pos = 51 + steps_into_home
+            if new_pos > 57:
+                if new_pos == 58: return 99, True
+                return current_pos, False
+            return new_pos, False
+
+    if 52 <= current_pos <= 57:
+        new_pos = current_pos + dice_value
+        if new_pos > 57:
+            if new_pos == 58: return 99, True
+            return current_pos, False
+        return new_pos, False
+
+    return current_pos, False
+
+def legacy_killing_impact(game, attacker_color, new_pos):
+    if new_pos < 0 or new_pos > 51: return []
+    if new_pos in LEGACY_SAFE_ZONE_INDICES: return []
+
+    to_reset = []
+    for p_idx, player in enumerate(game['players']):
+        if player['color'] == attacker_color: continue
+        if game.get('team_mode') and is_teammate(attacker_color, player['color']):
+            continue
+        for t_idx, token in enumerate(player['tokens']):
+            if token['position'] == new_pos:
+                to_reset.append((p_idx, t_idx))
+    return to_reset
+
+def legacy_team_victory(game_state):
+    team_finished = {1: True, 2: True}
+    for player in game_state['players']:
+        if not all(t['position'] == 99 for t in player['tokens']):
+            team_finished[player['team_id']] = False
+    if team_finished[1]: return 1
+    if team_finished[2]: return 2
+    return None
+
+# --- Legacy dataclass engine (ludo/rules.py) ---
+
+LEGACY_TRACK_START = {0: 0, 1: 13, 2: 26, 3: 39}
+LEGACY_SAFE_POSITIONS = [10, 15, 23, 28, 36, 41, 49, 2]
+
+def legacy_track_pos(color_index, relative_pos):
+    return (LEGACY_TRACK_START[color_index] + relative_pos) % 52
+
+def legacy_can_move(player, token_index, dice):
+    token = player.tokens[token_index]
+    if token.state == "home":
+        return dice == 6
+    if token.state == "finished":
+        return False
+    if token.state == "active":
+        return token.pos + dice <= 56
+    return False
+
+def legacy_classic_move(state, player_index, token_index, dice):
+    player = state.players[player_index]
+    if token_index < 0 or token_index >= len(player.tokens):
+        return False
+
+    token = player.tokens[token_index]
+    killed = False
+
+    if token.state == "home":
+        if dice == 6:
+            token.state = "active"
+            token.pos = 0
+        else:
+            return False
+    elif token.state == "active":
+        if (token.pos + dice) <= 56:
+            token.pos += dice
+            if token.pos == 56:
+                token.state = "finished"
+        else:
+            return False
+
+    if token.state == "active" and token.pos <= 50:
+        global_pos = legacy_track_pos(player.color_index, token.pos)
+        safe_spots = [p - 1 for p in LEGACY_SAFE_POSITIONS]
+        if global_pos not in safe_spots:
+            for other_idx, other_player in enumerate(state.players):
+                if other_idx == player_index: continue
+                for other_token in other_player.tokens:
+                    if other_token.state == "active" and other_token.pos <= 50:
+                        if legacy_track_pos(other_player.color_index, other_token.pos) == global_pos:
+                            other_token.state = "home"
+                            other_token.pos = 0
+                            killed = True
+    return killed
+
+# --- Games ---
+
+def pick_token(rng, legal):
+    """Mostly a legal token; sometimes any token, to exercise the illegal paths."""
+    if legal and rng.random() < 0.9:
+        return rng.choice(legal)
+    return rng.randrange(4)
+
+def play_db_game(rng, max_turns, check):
+    num_players = rng.randint(2, 4)
+    game = {
+        'team_mode': num_players == 4 and rng.random() < 0.5,
+        'players': [
+            {'color': color, 'team_id': get_team_id(color), 'tokens': [{'position': -1} for _ in range(4)]}
+            for color in range(num_players)
+        ],
+    }
+    # The core's positions and occupancy are carried across the whole game, like a caller maintaining them
+    positions = game_logic.game_positions(game)
+    occupancy = build_occupancy(positions)
+    turn = 0
+    for step in range(max_turns):
+        player = game['players'][turn]
+        color = player['color']
+        dice = rng.randint(1, 6)
+        legal = [i for i in range(4) if legacy_db_move(player, i, dice)[0] != player['tokens'][i]['position']]
+        check(game_logic.valid_moves(player, dice) == legal, "db valid_moves", step)
+
+        token_idx = pick_token(rng, legal)
+        expected = legacy_db_move(player, token_idx, dice)
+        check(game_logic.move_token(player, token_idx, dice) == expected, "db move_token", step)
+
+        kills = []
+        if token_idx in legal:
+            core = apply_move(game_logic.DB_GEOMETRY, positions, color, token_idx, dice, game['team_mode'], occupancy)
+
+            new_pos = expected[0]
+            player['tokens'][token_idx]['position'] = new_pos
+            kills = legacy_killing_impact(game, color, new_pos)
+            check(game_logic.get_killing_impact(game, color, new_pos) == kills, "db kills", step)
+            for p_idx, t_idx in kills:
+                game['players'][p_idx]['tokens'][t_idx]['position'] = -1
+            check(core is not None and positions == game_logic.game_positions(game), "db apply_move", step)
+            check(occupancy == build_occupancy(positions), "db occupancy", step)
+
+            if game['team_mode']:
+                winner = legacy_team_victory(game)
+                check(check_team_victory(game) == winner, "db team victory", step)
+                if winner: return step
+            elif all(t['position'] == 99 for t in player['tokens']):
+                return step
+        if dice != 6 and not kills:
+            turn = (turn + 1) % num_players
+    return max_turns
+
+def play_classic_game(rng, max_turns, check):
+    num_players = rng.randint(2, 4)
+    state = GameState(
+        chat_id=1, is_lobby=False,
+        players=[Player(user_id=color, first_name=f"Player {color}", color_index=color) for color in range(num_players)],
+    )
+    legacy = copy.deepcopy(state)
+    turn = 0
+    for step in range(max_turns):
+        dice = rng.randint(1, 6)
+        legal = [i for i in range(4) if legacy_can_move(legacy.players[turn], i, dice)]
+        check(rules.get_valid_moves(state.players[turn], dice) == legal, "classic valid moves", step)
+
+        token_idx = pick_token(rng, legal)
+        killed = legacy_classic_move(legacy, turn, token_idx, dice)
+        check(rules.move_token(state, turn, token_idx, dice) == killed, "classic move_token result", step)
+        check(state == legacy, "classic state", step)
+
+        if rules.is_game_over(legacy.players[turn]):
+            return step
+        if dice != 6 and not killed:
+            turn = (turn + 1) % num_players
+    return max_turns
+
+def main():
+    parser = argparse.ArgumentParser(description="Differential test: rules core vs the legacy rules engines.")
+    parser.add_argument("--games", type=int, default=500, help="games per engine")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--max-turns", type=int, default=3000)
+    args = parser.parse_args()
+
+    failures = []
+    def check(ok, what, step):
+        if not ok: failures.append(f"{what} (game {game_no}, step {step})")
+
+    rng = random.Random(args.seed)
+    for name, play in (("db", play_db_game), ("classic", play_classic_game)):
+        steps = 0
+        for game_no in range(args.games):
+            steps += play(rng, args.max_turns, check) + 1
+        print(f"{name}: {args.games} games, {steps} moves")
+
+    if failures:
+        print(f"\n❌ {len(failures)} mismatches, first ones:")
+        for failure in failures[:20]:
+            print(f"  {failure}")
+        sys.exit(1)
+    print("✅ Rules core matches both legacy engines")
+
+if __name__ == "__main__":
+    main()
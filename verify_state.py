@@ -0,0 +1,62 @@
+"""
+Round-trip check of the ludo.state binary codec (GameState.to_bytes / from_bytes).
+
+Usage:
+    python verify_state.py
+"""
+import sys
+
+from ludo.state import GameState, Player, Token, STATE_CODEC_VERSION, _HEADER, _PLAYER
+
+def make_state(first_name, match_id="m1"):
+    players = [
+        Player(user_id=10 + i, first_name=first_name, color_index=i,
+               tokens=[Token(pos=i * 7 + t, state="active") for t in range(4)])
+        for i in range(4)
+    ]
+    return GameState(chat_id=-100123, players=players, current_turn_index=2, dice_value=5,
+                     last_roll_time=1.5, is_lobby=False, winner=None, match_id=match_id)
+
+def version_1_blob(state):
+    """The version 1 layout: one-byte string lengths."""
+    def pack_str(value):
+        raw = value.encode()
+        return bytes((len(raw),)) + raw
+    parts = [_HEADER.pack(1, 4, state.chat_id, state.current_turn_index, state.dice_value,
+                          state.last_roll_time, len(state.players)), pack_str(state.match_id)]
+    for p in state.players:
+        parts.append(_PLAYER.pack(p.user_id, p.color_index, p.is_active))
+        parts.append(pack_str(p.first_name))
+        parts.append(bytes([len(p.tokens), *[64 | t.pos for t in p.tokens]]))
+    return b"".join(parts)
+
+def main():
+    failures = []
+    def check(ok, what):
+        if not ok: failures.append(what)
+
+    # 200 three-byte characters: 600 UTF-8 bytes, past the old one-byte length
+    for name in ("Ana", "安" * 200, "🎲" * 150 + "é"):
+        state = make_state(name, match_id="ключ" * 100)
+        blob = state.to_bytes()
+        check(blob[0] == STATE_CODEC_VERSION, "blob carries the codec version")
+        check(GameState.from_bytes(blob) == state, f"round trip of a {len(name.encode())}-byte name")
+
+    state = make_state("Ana")
+    check(GameState.from_bytes(version_1_blob(state)) == state, "version 1 blobs still decode")
+
+    try:
+        make_state("x" * 70000).to_bytes()
+        check(False, "a name over 65535 bytes raises")
+    except ValueError:
+        pass
+
+    if failures:
+        print(f"❌ {len(failures)} failures:")
+        for failure in failures:
+            print(f"  {failure}")
+        sys.exit(1)
+    print("✅ State codec round-trips")
+
+if __name__ == "__main__":
+    main()